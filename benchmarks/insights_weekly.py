@@ -0,0 +1,111 @@
+"""Latency benchmark for insights-engine ``/weekly`` against local stub services.
+
+Compares the previous implementation (a fresh ``httpx.Client`` per request and
+sequential ``/analyze`` then ``/clusters`` calls) with the async fan-out over a
+shared pooled client. Run from the repository root::
+
+    python benchmarks/insights_weekly.py --requests 400 --concurrency 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+
+from _harness import free_port, percentiles, serve
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def stub_service(delay_s: float, body: dict) -> FastAPI:
+    stub = FastAPI()
+
+    @stub.api_route("/{path:path}", methods=["GET", "POST"])
+    async def handler(path: str):
+        await asyncio.sleep(delay_s)
+        return body
+
+    return stub
+
+
+def legacy_app(ig_url: str, sent_url: str, trend_url: str) -> FastAPI:
+    legacy = FastAPI()
+
+    @legacy.post("/weekly")
+    def weekly(req: dict):
+        with httpx.Client(timeout=30) as client:
+            media = client.get(f"{ig_url}/ingest/recent_media?limit=100").json()
+            captions = [item.get("caption", "") for item in media.get("items", [])]
+            sent = client.post(f"{sent_url}/analyze", json={"texts": captions}).json()
+            clusters = client.post(f"{trend_url}/clusters", json={"texts": captions}).json()
+        return {"sent": len(sent.get("results", [])), "clusters": clusters.get("clusters", [])}
+
+    return legacy
+
+
+async def drive(url: str, total: int, concurrency: int) -> list[float]:
+    samples: list[float] = []
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+
+        async def one() -> None:
+            async with sem:
+                start = time.perf_counter()
+                response = await client.post(f"{url}/weekly", json={"platform": "instagram"})
+                response.raise_for_status()
+                samples.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one() for _ in range(total)))
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--media-delay-ms", type=float, default=5)
+    parser.add_argument("--sentiment-delay-ms", type=float, default=40)
+    parser.add_argument("--trend-delay-ms", type=float, default=60)
+    args = parser.parse_args()
+
+    captions = [{"caption": f"caption {i} #travel #food"} for i in range(100)]
+    with ExitStack() as stack:
+        ig_url = stack.enter_context(serve(stub_service(args.media_delay_ms / 1000, {"items": captions})))
+        sent_url = stack.enter_context(
+            serve(stub_service(args.sentiment_delay_ms / 1000, {"results": [{"label": "POSITIVE"}] * 100}))
+        )
+        trend_url = stack.enter_context(
+            serve(stub_service(args.trend_delay_ms / 1000, {"clusters": [{"cluster": 0, "top_terms": []}]}))
+        )
+
+        os.environ.update(
+            INSTAGRAM_SERVER_URL=ig_url,
+            SENTIMENT_ANALYZER_URL=sent_url,
+            TREND_DETECTOR_URL=trend_url,
+        )
+        sys.path.insert(0, str(ROOT / "mcp-data-processor" / "insights-engine"))
+        from app.main import app as current_app
+
+        before_url = stack.enter_context(serve(legacy_app(ig_url, sent_url, trend_url), free_port()))
+        after_url = stack.enter_context(serve(current_app, free_port()))
+
+        report = {}
+        for name, url in (("before", before_url), ("after", after_url)):
+            asyncio.run(drive(url, min(args.concurrency, args.requests), args.concurrency))  # warm-up
+            report[name] = percentiles(asyncio.run(drive(url, args.requests, args.concurrency)))
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Load test for the scheduler dispatcher against a stub publisher.
+
+Schedules thousands of posts over a short window, runs several dispatcher
+replicas against the same Redis, and reports how late each post reached the
+publisher, plus duplicates, losses and dead-lettered posts. The stub can fail
+a share of requests with 503 to exercise retries, and the bulk enqueue time
+is reported too. Needs a disposable Redis; only ``bench-*`` queues and the
+benchmark's own job IDs are touched. Run from the repository root::
+
+    python benchmarks/scheduler_dispatch.py --redis-url redis://localhost:6379/15 --posts 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+import redis.asyncio as redis
+from fastapi import FastAPI, Response
+
+from _harness import percentiles, serve
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "libs" / "common"))
+sys.path.insert(0, str(ROOT / "mcp-content-automation" / "scheduler"))
+
+from app.dispatcher import JOBS_KEY, Dispatcher, attempts_key, dead_key, processing_key, queue_key  # noqa: E402
+from app.jobs import Job, enqueue_many  # noqa: E402
+
+
+def stub_publisher(delay_s: float, failure_rate: float) -> tuple[FastAPI, list, threading.Lock]:
+    stub = FastAPI()
+    received: list[tuple[int, float]] = []
+    lock = threading.Lock()
+
+    @stub.post("/publish")
+    async def publish(req: dict):
+        await asyncio.sleep(delay_s)
+        if random.random() < failure_rate:
+            return Response(status_code=503)
+        with lock:
+            received.append((req["id"], time.time() - req["due"]))
+        return {"ok": True}
+
+    return stub, received, lock
+
+
+async def run(args: argparse.Namespace, publisher_url: str, received: list, lock: threading.Lock) -> dict:
+    platforms = [f"bench-{index}" for index in range(args.platforms)]
+    admin = redis.Redis.from_url(args.redis_url)
+    keys = [
+        key(platform)
+        for platform in platforms
+        for key in (queue_key, processing_key, dead_key, attempts_key)
+    ]
+    await admin.delete(*keys)
+
+    start = time.time() + 2.0
+    jobs = []
+    for post_id in range(args.posts):
+        due = start + random.uniform(0, args.window)
+        payload = {"id": post_id, "due": due, "caption": f"post {post_id}"}
+        jobs.append(Job(platforms[post_id % len(platforms)], due, payload))
+    load_started = time.perf_counter()
+    job_ids, _ = await enqueue_many(admin, jobs)
+    load_ms = (time.perf_counter() - load_started) * 1000
+
+    replicas = []
+    for _ in range(args.replicas):
+        client = redis.Redis.from_url(args.redis_url)
+        http = httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=args.concurrency))
+        dispatcher = Dispatcher(
+            client,
+            http,
+            publisher_url,
+            platforms,
+            concurrency=args.concurrency,
+            retry_base_seconds=0.2,
+            poll_interval=args.poll_interval,
+        )
+        dispatcher.start()
+        replicas.append((dispatcher, client, http))
+
+    deadline = start + args.window + args.timeout
+    dead = 0
+    while time.time() < deadline:
+        await asyncio.sleep(0.5)
+        dead = sum(await asyncio.gather(*(admin.zcard(dead_key(platform)) for platform in platforms)))
+        with lock:
+            delivered = len({post_id for post_id, _ in received})
+        if delivered + dead >= args.posts:
+            break
+    elapsed = time.time() - start
+
+    for dispatcher, client, http in replicas:
+        await dispatcher.stop()
+        await http.aclose()
+        await client.aclose()
+    await admin.delete(*keys)
+    await admin.hdel(JOBS_KEY, *job_ids)
+    await admin.aclose()
+
+    with lock:
+        counts = Counter(post_id for post_id, _ in received)
+        lateness = [late for _, late in received]
+    stats = Counter()
+    for dispatcher, _, _ in replicas:
+        stats.update(dispatcher.stats)
+    return {
+        "posts": args.posts,
+        "replicas": args.replicas,
+        "published": len(counts),
+        "duplicates": sum(count - 1 for count in counts.values()),
+        "lost": args.posts - len(counts) - dead,
+        "dead": dead,
+        "retried": stats["retried"],
+        "bulk_enqueue_ms": round(load_ms, 1),
+        "elapsed_s": round(elapsed, 2),
+        "lateness": percentiles(lateness) if len(lateness) > 1 else {},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--window", type=float, default=20.0, help="seconds the due times spread over")
+    parser.add_argument("--platforms", type=int, default=4)
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--publish-delay-ms", type=float, default=20)
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument("--timeout", type=float, default=60.0, help="extra seconds to wait after the window")
+    args = parser.parse_args()
+
+    stub, received, lock = stub_publisher(args.publish_delay_ms / 1000, args.failure_rate)
+    with serve(stub) as publisher_url:
+        report = asyncio.run(run(args, publisher_url, received, lock))
+    print(json.dumps(report, indent=2))
+    if report["duplicates"] or report["lost"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
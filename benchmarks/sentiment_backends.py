@@ -0,0 +1,121 @@
+"""Parity and throughput check for the sentiment-analyzer inference backends.
+
+Runs the same caption corpus through the fp32 PyTorch pipeline and the ONNX
+Runtime backends, then reports throughput, peak resident memory and label
+agreement with PyTorch. Each backend runs in its own spawned process, so the
+peak RSS of one never hides another's. Exits non-zero when an ONNX backend
+agrees on fewer labels than ``--min-agreement``. Needs the ``onnx`` extra of
+the service::
+
+    python benchmarks/sentiment_backends.py --texts 512 --batch-size 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "mcp-data-processor" / "sentiment-analyzer"))
+
+WORDS = (
+    "amazing awful brunch cocktail cozy disappointing dinner friendly great "
+    "hotel late lovely noisy overpriced perfect pool rooftop rude service "
+    "slow spa staff stunning terrible view waiting wonderful"
+).split()
+
+
+def corpus(size: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))) + " #travel"
+        for _ in range(size)
+    ]
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(clf, texts: list[str], batch_size: int) -> tuple[list[dict], float]:
+    clf(texts[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    out = []
+    for offset in range(0, len(texts), batch_size):
+        chunk = texts[offset : offset + batch_size]
+        out.extend(clf(chunk, batch_size=len(chunk)))
+    return out, time.perf_counter() - start
+
+
+def run_backend(
+    args: argparse.Namespace, texts: list[str], backend: str, quantize: bool, queue: mp.Queue
+) -> None:
+    from app.backends import load_pipeline
+
+    rss_start = peak_rss_mb()
+    clf = load_pipeline(args.model, backend=backend, quantize=quantize, onnx_dir=args.onnx_dir)
+    out, elapsed = run(clf, texts, args.batch_size)
+    queue.put(
+        {
+            "labels": [item["label"] for item in out],
+            "seconds": elapsed,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_growth_mb": peak_rss_mb() - rss_start,
+        }
+    )
+
+
+def measure(args: argparse.Namespace, texts: list[str], backend: str, quantize: bool) -> dict:
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=run_backend, args=(args, texts, backend, quantize, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="cardiffnlp/twitter-roberta-base-sentiment")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--onnx-dir", default="/tmp/onnx-models")
+    parser.add_argument("--min-agreement", type=float, default=0.97)
+    args = parser.parse_args()
+
+    texts = corpus(args.texts)
+    variants = (("torch", False), ("onnx", False), ("onnx", True))
+    report: dict[str, dict] = {}
+    reference: list[str] | None = None
+    failed = False
+
+    for backend, quantize in variants:
+        name = f"{backend}{'-int8' if quantize else ''}"
+        result = measure(args, texts, backend, quantize)
+        labels = result["labels"]
+        if reference is None:
+            reference = labels
+        agreement = sum(a == b for a, b in zip(labels, reference)) / len(reference)
+        report[name] = {
+            "texts_per_s": round(len(texts) / result["seconds"], 1),
+            "peak_rss_mb": round(result["peak_rss_mb"], 1),
+            "peak_rss_growth_mb": round(result["peak_rss_growth_mb"], 1),
+            "label_agreement": round(agreement, 4),
+        }
+        if backend != "torch" and agreement < args.min_agreement:
+            failed = True
+
+    print(json.dumps(report, indent=2))
+    if failed:
+        sys.exit(f"label agreement below {args.min_agreement}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark of the trend-detector reduction stage before HDBSCAN.
+
+Clusters a synthetic caption corpus with the previous path (raw sparse
+TF-IDF, ``gen_min_span_tree=True``) and with each reduction variant. Reports
+wall time, peak RSS growth and adjusted Rand agreement with the previous
+labels. Every variant runs in its own process so peak RSS is not shared::
+
+    python benchmarks/trend_reduction.py --docs 2000 5000 --components 100 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "mcp-data-processor" / "trend-detector"))
+
+TOPICS = [
+    "rooftop cocktails sunset skyline bar view",
+    "spa massage wellness sauna relax retreat",
+    "brunch pancakes coffee avocado eggs mimosa",
+    "beach resort pool cabana ocean sand",
+    "mountain cabin fireplace snow ski chalet",
+    "street food market tacos night stalls",
+    "wine tasting vineyard cellar sommelier pairing",
+    "family kids club playground suite holiday",
+]
+FILLER = "great amazing lovely weekend trip travel food hotel staff friendly".split()
+
+
+def corpus(size: int, seed: int = 3) -> list[str]:
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(size):
+        topic = rng.choice(TOPICS).split()
+        words = rng.sample(topic, k=4) + rng.sample(FILLER, k=3)
+        rng.shuffle(words)
+        docs.append(" ".join(words) + f" #{topic[0]}")
+    return docs
+
+
+def run_variant(texts: list[str], variant: dict, queue: mp.Queue) -> None:
+    import hdbscan
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    from app.clustering import embed, make_reducer
+
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    X = TfidfVectorizer(max_df=0.9, min_df=2, ngram_range=(1, 2)).fit_transform(texts)
+    if variant["reduction"] == "legacy":
+        clusterer = hdbscan.HDBSCAN(min_cluster_size=2, gen_min_span_tree=True)
+        clusterer.fit(X)
+    else:
+        reducer = make_reducer(variant["reduction"], variant["n_components"], X.shape[1])
+        clusterer = hdbscan.HDBSCAN(min_cluster_size=2, algorithm=variant["algorithm"])
+        clusterer.fit(embed(X, reducer, fit=True))
+    queue.put(
+        {
+            "seconds": time.perf_counter() - started,
+            "peak_rss_growth_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_start) / 1024,
+            "labels": clusterer.labels_.tolist(),
+        }
+    )
+
+
+def measure(texts: list[str], variant: dict) -> dict:
+    queue: mp.Queue = mp.Queue()
+    proc = mp.Process(target=run_variant, args=(texts, variant, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main() -> None:
+    from sklearn.metrics import adjusted_rand_score
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, nargs="+", default=[2_000, 5_000])
+    parser.add_argument("--components", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--algorithm", default="best")
+    args = parser.parse_args()
+
+    for size in args.docs:
+        texts = corpus(size)
+        baseline = measure(texts, {"reduction": "legacy"})
+        variants = [
+            {"reduction": method, "n_components": n, "algorithm": args.algorithm}
+            for method in ("svd", "random")
+            for n in args.components
+        ]
+        rows = [{"docs": size, "variant": "legacy", **_summary(baseline, baseline, adjusted_rand_score)}]
+        for variant in variants:
+            result = measure(texts, variant)
+            name = f"{variant['reduction']}-{variant['n_components']}"
+            rows.append({"docs": size, "variant": name, **_summary(result, baseline, adjusted_rand_score)})
+        for row in rows:
+            print(json.dumps(row), flush=True)
+
+
+def _summary(result: dict, baseline: dict, score) -> dict:
+    return {
+        "wall_s": round(result["seconds"], 3),
+        "peak_rss_growth_mb": round(result["peak_rss_growth_mb"], 1),
+        "ari_vs_legacy": round(score(baseline["labels"], result["labels"]), 4),
+        "clusters": len(set(result["labels"]) - {-1}),
+    }
+
+
+if __name__ == "__main__":
+    main()
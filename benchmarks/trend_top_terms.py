@@ -0,0 +1,86 @@
+"""Benchmark of trend-detector centroid/top-term post-processing.
+
+Compares the previous per-cluster loop (Python index lists, dense
+``np.mean`` and a full ``argsort`` per cluster) with the sparse
+indicator-product path across corpus and vocabulary sizes::
+
+    python benchmarks/trend_top_terms.py --clusters 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "mcp-data-processor" / "trend-detector"))
+
+from app.clustering import cluster_top_terms  # noqa: E402
+
+
+def legacy_top_terms(X, labels, terms, k: int = 8) -> dict[int, list[str]]:
+    out = {}
+    for cluster_id in set(labels):
+        if cluster_id == -1:
+            continue
+        indices = [i for i, label in enumerate(labels) if label == cluster_id]
+        centroid = np.mean(X[indices], axis=0)
+        top = centroid.A.flatten().argsort()[-k:][::-1]
+        out[cluster_id] = [terms[i] for i in top]
+    return out
+
+
+def timed(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--vocab", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--terms-per-doc", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    rows = []
+    for n_docs in args.docs:
+        for vocab in args.vocab:
+            X = sp.random(
+                n_docs,
+                vocab,
+                density=args.terms_per_doc / vocab,
+                format="csr",
+                dtype=np.float64,
+                random_state=rng,
+            )
+            labels = rng.integers(-1, args.clusters, size=n_docs).tolist()
+            terms = np.array([f"t{i}" for i in range(vocab)], dtype=object)
+
+            legacy = timed(legacy_top_terms, X, labels, terms)
+            current = timed(cluster_top_terms, X, labels, terms)
+            rows.append(
+                {
+                    "docs": n_docs,
+                    "vocab": vocab,
+                    "legacy_ms": round(legacy * 1000, 2),
+                    "sparse_ms": round(current * 1000, 2),
+                    "speedup": round(legacy / current, 1),
+                }
+            )
+            print(json.dumps(rows[-1]), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,71 @@
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- Partitioned by month on timestamp; the instagram-server creates monthly
+-- partitions on demand. Existing databases: see migrations/.
 CREATE TABLE IF NOT EXISTS instagram_media (
-    id TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
     caption TEXT,
     media_type TEXT,
     media_url TEXT,
-    timestamp TIMESTAMPTZ,
+    timestamp TIMESTAMPTZ NOT NULL,
     like_count INT,
     comments_count INT,
-    inserted_at TIMESTAMPTZ DEFAULT NOW()
+    inserted_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE IF NOT EXISTS instagram_media_default PARTITION OF instagram_media DEFAULT;
+
+CREATE INDEX IF NOT EXISTS ix_instagram_media_timestamp ON instagram_media (timestamp DESC);
+CREATE INDEX IF NOT EXISTS ix_instagram_media_inserted_at ON instagram_media (inserted_at);
+CREATE INDEX IF NOT EXISTS ix_instagram_media_engagement
+    ON instagram_media ((COALESCE(like_count, 0) + COALESCE(comments_count, 0)) DESC);
+
+CREATE TABLE IF NOT EXISTS instagram_hashtag_ids (
+    hashtag TEXT PRIMARY KEY,
+    hashtag_id TEXT NOT NULL,
+    resolved_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS instagram_ingest_cursors (
+    account_id TEXT PRIMARY KEY,
+    cursor TEXT,
+    pages INT NOT NULL DEFAULT 0,
+    items INT NOT NULL DEFAULT 0,
+    completed BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS instagram_sync_watermarks (
+    account_id TEXT PRIMARY KEY,
+    newest_timestamp TIMESTAMPTZ,
+    last_inserted_at TIMESTAMPTZ,
+    last_synced_at TIMESTAMPTZ
+);
+
+-- Daily engagement rollups (libs/common/common/rollups.py).
+CREATE TABLE IF NOT EXISTS hashtag_engagement_daily (
+    platform TEXT NOT NULL,
+    hashtag TEXT NOT NULL,
+    day DATE NOT NULL,
+    posts INT NOT NULL DEFAULT 0,
+    likes BIGINT NOT NULL DEFAULT 0,
+    comments BIGINT NOT NULL DEFAULT 0,
+    impressions BIGINT,
+    reach BIGINT,
+    avg_engagement_rate DOUBLE PRECISION,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (platform, hashtag, day)
+);
+
+CREATE TABLE IF NOT EXISTS account_engagement_daily (
+    platform TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    day DATE NOT NULL,
+    posts INT NOT NULL DEFAULT 0,
+    likes BIGINT NOT NULL DEFAULT 0,
+    comments BIGINT NOT NULL DEFAULT 0,
+    avg_engagement_rate DOUBLE PRECISION,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (platform, account_id, day)
 );
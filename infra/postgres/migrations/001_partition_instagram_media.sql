@@ -0,0 +1,55 @@
+-- Convert an existing unpartitioned instagram_media table to monthly range
+-- partitions. Fresh databases get this layout from init.sql directly.
+-- Run once, during a maintenance window: psql -f 001_partition_instagram_media.sql
+
+BEGIN;
+
+ALTER TABLE instagram_media RENAME TO instagram_media_unpartitioned;
+ALTER INDEX IF EXISTS instagram_media_pkey RENAME TO instagram_media_unpartitioned_pkey;
+
+CREATE TABLE instagram_media (
+    id TEXT NOT NULL,
+    caption TEXT,
+    media_type TEXT,
+    media_url TEXT,
+    timestamp TIMESTAMPTZ NOT NULL,
+    like_count INT,
+    comments_count INT,
+    inserted_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    FOR month IN
+        SELECT DISTINCT date_trunc('month', timestamp AT TIME ZONE 'UTC')::date
+        FROM instagram_media_unpartitioned
+        WHERE timestamp IS NOT NULL
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE instagram_media_%s PARTITION OF instagram_media FOR VALUES FROM (%L) TO (%L)',
+            to_char(month, 'YYYY_MM'),
+            month::timestamp AT TIME ZONE 'UTC',
+            (month + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+END $$;
+
+CREATE TABLE instagram_media_default PARTITION OF instagram_media DEFAULT;
+
+-- Rows without a timestamp cannot be keyed in the partitioned table.
+INSERT INTO instagram_media
+SELECT id, caption, media_type, media_url, timestamp, like_count, comments_count, inserted_at
+FROM instagram_media_unpartitioned
+WHERE timestamp IS NOT NULL;
+
+CREATE INDEX ix_instagram_media_timestamp ON instagram_media (timestamp DESC);
+CREATE INDEX ix_instagram_media_inserted_at ON instagram_media (inserted_at);
+CREATE INDEX ix_instagram_media_engagement
+    ON instagram_media ((COALESCE(like_count, 0) + COALESCE(comments_count, 0)) DESC);
+
+DROP TABLE instagram_media_unpartitioned;
+
+COMMIT;
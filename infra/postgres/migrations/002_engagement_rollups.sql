@@ -0,0 +1,28 @@
+-- Adds the daily engagement rollup tables to an existing database.
+-- Fresh databases get them from init.sql.
+
+CREATE TABLE IF NOT EXISTS hashtag_engagement_daily (
+    platform TEXT NOT NULL,
+    hashtag TEXT NOT NULL,
+    day DATE NOT NULL,
+    posts INT NOT NULL DEFAULT 0,
+    likes BIGINT NOT NULL DEFAULT 0,
+    comments BIGINT NOT NULL DEFAULT 0,
+    impressions BIGINT,
+    reach BIGINT,
+    avg_engagement_rate DOUBLE PRECISION,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (platform, hashtag, day)
+);
+
+CREATE TABLE IF NOT EXISTS account_engagement_daily (
+    platform TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    day DATE NOT NULL,
+    posts INT NOT NULL DEFAULT 0,
+    likes BIGINT NOT NULL DEFAULT 0,
+    comments BIGINT NOT NULL DEFAULT 0,
+    avg_engagement_rate DOUBLE PRECISION,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (platform, account_id, day)
+);
@@ -0,0 +1,24 @@
+-- Instagram hashtag rollups used to hold daily snapshots of the public
+-- hashtag search; they now aggregate the account's own stored media. Replace
+-- the old rows with aggregates of everything already ingested. New ingests
+-- keep them current from then on.
+-- Run once: psql -f 003_instagram_hashtag_rollups.sql
+
+BEGIN;
+
+DELETE FROM hashtag_engagement_daily WHERE platform = 'instagram';
+
+INSERT INTO hashtag_engagement_daily
+    (platform, hashtag, day, posts, likes, comments, avg_engagement_rate, updated_at)
+SELECT 'instagram', hashtag, day, COUNT(*), COALESCE(SUM(like_count), 0), COALESCE(SUM(comments_count), 0),
+       ROUND((COALESCE(SUM(like_count), 0) + COALESCE(SUM(comments_count), 0))::numeric / COUNT(*), 3)::float,
+       NOW()
+FROM (
+    SELECT DISTINCT id, lower(tag[1]) AS hashtag, (timestamp AT TIME ZONE 'UTC')::date AS day,
+           like_count, comments_count
+    FROM instagram_media CROSS JOIN LATERAL regexp_matches(caption, '#(\w+)', 'g') AS tag
+    WHERE timestamp IS NOT NULL
+) AS tagged
+GROUP BY hashtag, day;
+
+COMMIT;
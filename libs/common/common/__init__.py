@@ -1,5 +1,21 @@
 """Shared DTOs and utilities for Mitch AI services."""
 
-from .dto import HashtagInsights, HealthResponse, MediaItem
+from .dto import (
+    EngagementPoint,
+    EngagementSummary,
+    HashtagBatchRequest,
+    HashtagBatchResponse,
+    HashtagInsights,
+    HealthResponse,
+    MediaItem,
+)
 
-__all__ = ["HashtagInsights", "HealthResponse", "MediaItem"]
+__all__ = [
+    "EngagementPoint",
+    "EngagementSummary",
+    "HashtagBatchRequest",
+    "HashtagBatchResponse",
+    "HashtagInsights",
+    "HealthResponse",
+    "MediaItem",
+]
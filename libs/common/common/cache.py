@@ -0,0 +1,200 @@
+"""Response cache for platform endpoints with stale-while-revalidate.
+
+Entries live in an in-process LRU and, when a Redis URL is configured, in
+Redis so replicas share them. Every endpoint has its own TTL:
+
+* younger than the TTL, an entry is served as is;
+* for ``stale_seconds`` after that it is still served immediately while a
+  background task refreshes it;
+* older entries, and misses, wait for the upstream call.
+
+Concurrent loads of the same key share one upstream call. ``None`` results
+(nothing found upstream) are not cached. Redis errors are logged and treated
+as misses so the cache never fails a request.
+
+Redis support requires the ``cache`` extra; import this module directly, it
+is not re-exported from ``common``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+Entry = tuple[float, Any]
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        namespace: str,
+        ttls: dict[str, float] | None = None,
+        default_ttl: float = 300.0,
+        stale_seconds: float = 3600.0,
+        max_entries: int = 1024,
+        redis_url: str | None = None,
+    ):
+        self.namespace = namespace
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._lru: OrderedDict[str, Entry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+
+    def key(self, endpoint: str, params: dict) -> str:
+        digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return f"cache:{self.namespace}:{endpoint}:{digest[:32]}"
+
+    def ttl(self, endpoint: str) -> float:
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    async def get_or_fetch(
+        self,
+        endpoint: str,
+        params: dict,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return the cached value for ``(endpoint, params)``, calling ``fetch`` as needed.
+
+        ``fetch`` may outlive the request that triggered it (background
+        refresh, or other waiters on the same key), so it must not depend on
+        request-scoped resources.
+        """
+        key = self.key(endpoint, params)
+        ttl = self.ttl(endpoint)
+        entry = await self._lookup(key, ttl)
+        if entry is not None:
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                self.hits += 1
+                return value
+            if age < ttl + self.stale_seconds:
+                self.stale_hits += 1
+                self._load(key, ttl, fetch)
+                return value
+        self.misses += 1
+        # Shielded so a disconnecting caller does not cancel the shared load.
+        return await asyncio.shield(self._load(key, ttl, fetch))
+
+    async def peek(self, endpoint: str, params: dict) -> Any:
+        """Fresh cached value or None, without starting a load.
+
+        For callers that batch their own upstream fetches and ``put`` the
+        results back per key.
+        """
+        key = self.key(endpoint, params)
+        ttl = self.ttl(endpoint)
+        entry = await self._lookup(key, ttl)
+        if entry is not None and time.time() - entry[0] < ttl:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    async def put(self, endpoint: str, params: dict, value: Any) -> None:
+        if value is not None:
+            await self._store(self.key(endpoint, params), (time.time(), value), self.ttl(endpoint))
+
+    # -- internals -------------------------------------------------------
+
+    def _load(self, key: str, ttl: float, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(key, ttl, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        # Retrieve the exception so background refreshes never go unobserved;
+        # foreground waiters still receive it through their await.
+        exc = task.exception()
+        if exc is not None:
+            self.refresh_errors += 1
+            logger.warning("Cache load for %s failed: %s", key, exc)
+
+    async def _refresh(self, key: str, ttl: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        if value is not None:
+            await self._store(key, (time.time(), value), ttl)
+        return value
+
+    async def _lookup(self, key: str, ttl: float) -> Entry | None:
+        entry = self._lru.get(key)
+        if entry is not None:
+            self._lru.move_to_end(key)
+            if time.time() - entry[0] < ttl:
+                return entry
+        if self._redis is None:
+            return entry
+        # Local entry is missing or stale; another replica may have refreshed it.
+        try:
+            raw = await self._redis.get(key)
+        except Exception as exc:
+            logger.warning("Redis cache lookup failed: %s", exc)
+            return entry
+        if raw is None:
+            return entry
+        stored_at, value = json.loads(raw)
+        if entry is None or stored_at > entry[0]:
+            entry = (stored_at, value)
+            self._remember(key, entry)
+        return entry
+
+    async def _store(self, key: str, entry: Entry, ttl: float) -> None:
+        self._remember(key, entry)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(key, json.dumps(entry), ex=math.ceil(ttl + self.stale_seconds))
+        except Exception as exc:
+            logger.warning("Redis cache write failed: %s", exc)
+
+    def _remember(self, key: str, entry: Entry) -> None:
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "inflight": len(self._inflight),
+            "refresh_errors": self.refresh_errors,
+            "ttls": self.ttls,
+            "redis": self._redis is not None,
+        }
+
+    async def close(self) -> None:
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._redis is not None:
+            await self._redis.aclose()
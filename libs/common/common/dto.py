@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Any
 
 from pydantic import BaseModel, Field
@@ -14,6 +14,7 @@ class HealthResponse(BaseModel):
 
 class MediaItem(BaseModel):
     id: str
+    platform: str | None = None
     caption: str | None = None
     media_type: str | None = None
     media_url: str | None = None
@@ -30,8 +31,42 @@ class HashtagInsights(BaseModel):
     top_posts: list[MediaItem] = Field(default_factory=list)
 
 
+class HashtagBatchRequest(BaseModel):
+    tags: list[str]
+
+
+class HashtagBatchResponse(BaseModel):
+    items: list[HashtagInsights] = Field(default_factory=list)
+    # Tags the platform returned nothing for.
+    missing: list[str] = Field(default_factory=list)
+    # Tags whose upstream call failed (e.g. rate limited), with the reason.
+    errors: dict[str, str] = Field(default_factory=dict)
+
+
+class EngagementPoint(BaseModel):
+    day: date
+    posts: int = Field(default=0, ge=0)
+    likes: int = Field(default=0, ge=0)
+    comments: int = Field(default=0, ge=0)
+    impressions: int | None = Field(default=None, ge=0)
+    reach: int | None = Field(default=None, ge=0)
+    avg_engagement_rate: float | None = None
+
+
+class EngagementSummary(BaseModel):
+    days: int = Field(ge=1)
+    posts: int = Field(default=0, ge=0)
+    likes: int = Field(default=0, ge=0)
+    comments: int = Field(default=0, ge=0)
+    avg_engagement_rate: float | None = None
+
+
 __all__ = [
     "HealthResponse",
     "MediaItem",
     "HashtagInsights",
+    "HashtagBatchRequest",
+    "HashtagBatchResponse",
+    "EngagementPoint",
+    "EngagementSummary",
 ]
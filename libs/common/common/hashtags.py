@@ -0,0 +1,25 @@
+"""Hashtag helpers shared by the platform servers.
+
+``batch_tags`` validates ``/metrics/hashtag/batch`` input and raises FastAPI's
+``HTTPException``; FastAPI is imported lazily so the rest of ``common`` does
+not depend on it. Import this module directly, it is not re-exported from
+``common``.
+"""
+
+from __future__ import annotations
+
+
+def normalize_tag(tag: str) -> str:
+    return tag.lstrip("#").lower()
+
+
+def batch_tags(tags: list[str], limit: int) -> list[str]:
+    """Normalized, de-duplicated tags in request order; 422 if empty or over ``limit``."""
+    from fastapi import HTTPException
+
+    unique = list(dict.fromkeys(normalize_tag(tag) for tag in tags if tag.strip("# ")))
+    if not unique:
+        raise HTTPException(status_code=422, detail="No hashtags given")
+    if len(unique) > limit:
+        raise HTTPException(status_code=422, detail=f"At most {limit} hashtags per batch")
+    return unique
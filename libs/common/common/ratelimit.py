@@ -0,0 +1,269 @@
+"""Rate-limit-aware request scheduling for the platform API clients.
+
+One token bucket is kept per ``(platform, access token)``. Callers take a
+token before each upstream call (higher priority first), and every response
+is fed back so the bucket follows what the API reports: Meta's
+``X-App-Usage``/``X-Business-Use-Case-Usage`` percentages, Twitter's
+``x-rate-limit-remaining``/``x-rate-limit-reset`` and ``Retry-After`` on 429.
+Throttled calls are retried with jittered exponential backoff and end in
+``RateLimited`` instead of an empty payload; so does any wait on the limiter
+longer than the caller's ``max_wait``.
+
+Works with any response object exposing ``status_code`` and ``headers``, so
+it has no HTTP client dependency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+# Lower numbers are served first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Default limits on how long a caller may wait for a token. Request handlers
+# fail fast with 429; background jobs can sit out a full rate-limit window.
+MAX_WAIT_INTERACTIVE = 10.0
+MAX_WAIT_BACKGROUND = 900.0
+
+# Meta usage percentage above which we start pausing before it hits 100.
+USAGE_HIGH_WATERMARK = 85.0
+
+
+class RateLimited(Exception):
+    def __init__(self, platform: str, retry_after: float):
+        super().__init__(f"{platform} rate limit exhausted, retry in {retry_after:.0f}s")
+        self.platform = platform
+        self.retry_after = retry_after
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class TokenBucket:
+    def __init__(self, platform: str, rate: float, burst: int):
+        self.platform = platform
+        self.rate = rate
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._queue: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+
+    # -- acquisition -----------------------------------------------------
+
+    def _try_take(self, ticket: tuple[int, int]) -> float:
+        """Take a token for ``ticket`` or return how long to wait. Caller holds the lock."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self._queue[0] != ticket:
+            return 0.05
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        heapq.heappop(self._queue)
+        self._cond.notify_all()
+        return 0.0
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, max_wait: float | None = None) -> None:
+        """Wait for a token; raises ``RateLimited`` if that would take longer than ``max_wait``."""
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            try:
+                while (delay := self._try_take(ticket)) > 0:
+                    self._check_deadline(delay, deadline)
+                    self._cond.wait(delay)
+            except BaseException:
+                self._abandon(ticket)
+                raise
+
+    async def acquire_async(self, priority: int = PRIORITY_INTERACTIVE, max_wait: float | None = None) -> None:
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_take(ticket)
+                if delay <= 0:
+                    return
+                self._check_deadline(delay, deadline)
+                await asyncio.sleep(delay)
+        except BaseException:
+            with self._cond:
+                self._abandon(ticket)
+            raise
+
+    def _check_deadline(self, delay: float, deadline: float | None) -> None:
+        if deadline is not None and time.monotonic() + delay > deadline:
+            raise RateLimited(self.platform, max(delay, self.retry_after()))
+
+    def _abandon(self, ticket: tuple[int, int]) -> None:
+        """Drop a ticket that gave up waiting. Caller holds the lock."""
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+    # -- feedback --------------------------------------------------------
+
+    def observe(self, response: Any, attempt: int = 0) -> float | None:
+        """Update the bucket from a response; returns a retry delay if throttled."""
+        headers = response.headers
+        now = time.monotonic()
+        pause = 0.0
+
+        usage = _meta_usage(headers)
+        if usage is not None and usage >= USAGE_HIGH_WATERMARK:
+            # Ease off progressively as usage approaches 100%.
+            pause = 60.0 * (usage - USAGE_HIGH_WATERMARK) / (100 - USAGE_HIGH_WATERMARK)
+
+        remaining = _int_header(headers, "x-rate-limit-remaining", "x-ratelimit-remaining")
+        reset = _int_header(headers, "x-rate-limit-reset", "x-ratelimit-reset")
+        if remaining is not None:
+            with self._cond:
+                self.tokens = min(self.tokens, float(remaining))
+            if remaining == 0 and reset is not None:
+                pause = max(pause, reset - time.time())
+
+        retry = None
+        if response.status_code == 429:
+            retry_after = _float_header(headers, "retry-after")
+            retry = max(pause, retry_after if retry_after is not None else backoff_delay(attempt))
+            pause = retry
+
+        if pause > 0:
+            with self._cond:
+                jittered = pause * random.uniform(1.0, 1.2)
+                self.blocked_until = max(self.blocked_until, now + jittered)
+                self._cond.notify_all()
+        return retry
+
+    def retry_after(self) -> float:
+        return max(0.0, self.blocked_until - time.monotonic())
+
+
+def send(
+    bucket: TokenBucket,
+    call: Callable[[], Any],
+    priority: int = PRIORITY_INTERACTIVE,
+    max_retries: int = 3,
+    max_wait: float | None = MAX_WAIT_INTERACTIVE,
+) -> Any:
+    """Run ``call`` under ``bucket``, retrying throttled responses.
+
+    ``max_wait`` bounds the total time spent waiting on the limiter; once a
+    wait would go past it, ``RateLimited`` is raised straight away.
+    """
+    deadline = None if max_wait is None else time.monotonic() + max_wait
+    for attempt in range(max_retries + 1):
+        bucket.acquire(priority, _remaining(deadline))
+        response = call()
+        if bucket.observe(response, attempt) is None:
+            return response
+    raise RateLimited(bucket.platform, bucket.retry_after())
+
+
+async def send_async(
+    bucket: TokenBucket,
+    call: Callable[[], Awaitable[Any]],
+    priority: int = PRIORITY_INTERACTIVE,
+    max_retries: int = 3,
+    max_wait: float | None = MAX_WAIT_INTERACTIVE,
+) -> Any:
+    deadline = None if max_wait is None else time.monotonic() + max_wait
+    for attempt in range(max_retries + 1):
+        await bucket.acquire_async(priority, _remaining(deadline))
+        response = await call()
+        if bucket.observe(response, attempt) is None:
+            return response
+    raise RateLimited(bucket.platform, bucket.retry_after())
+
+
+def _remaining(deadline: float | None) -> float | None:
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def install_rate_limit_handler(app: Any) -> None:
+    """Answer ``RateLimited`` with 429 and a ``Retry-After`` header."""
+    from fastapi.responses import JSONResponse
+
+    @app.exception_handler(RateLimited)
+    def rate_limited(request: Any, exc: RateLimited) -> JSONResponse:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+        )
+
+
+_buckets: dict[tuple[str, str], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(platform: str, token: str, rate: float, burst: int) -> TokenBucket:
+    """Process-wide bucket for one platform credential."""
+    key = (platform, hashlib.sha256(token.encode("utf-8")).hexdigest()[:16])
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(platform, rate, burst)
+        return bucket
+
+
+def _meta_usage(headers: Any) -> float | None:
+    peaks = []
+    for name in ("x-app-usage", "x-business-use-case-usage"):
+        raw = headers.get(name)
+        if not raw:
+            continue
+        try:
+            payload = json.loads(raw)
+            # Business use case usage is keyed by business ID, each with a list.
+            entries = [payload] if name == "x-app-usage" else [
+                entry for values in payload.values() for entry in values
+            ]
+            peaks.extend(
+                float(entry.get(field, 0))
+                for entry in entries
+                for field in ("call_count", "total_time", "total_cputime")
+            )
+        except (ValueError, AttributeError, TypeError):
+            # Unexpected header shape; never let it fail the response.
+            continue
+    return max(peaks) if peaks else None
+
+
+def _int_header(headers: Any, *names: str) -> int | None:
+    value = _float_header(headers, *names)
+    return int(value) if value is not None else None
+
+
+def _float_header(headers: Any, *names: str) -> float | None:
+    for name in names:
+        raw = headers.get(name)
+        if raw is None:
+            continue
+        try:
+            return float(raw)
+        except ValueError:
+            return None
+    return None
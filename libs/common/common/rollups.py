@@ -0,0 +1,200 @@
+"""Daily engagement rollups stored in Postgres.
+
+Rows are aggregates of stored media, maintained incrementally: each ingest
+recomputes only the days it touched, and reads sum those days instead of
+re-fetching and re-summing posts.
+
+Only Instagram stores media (``instagram_media``), so it is the one platform
+whose rollups are aggregates: ``account_engagement_daily`` covers the
+account's posts, ``hashtag_engagement_daily`` the same posts grouped by the
+hashtags in their captions. Its ``/metrics/account``, ``/metrics/*/summary``
+and ``/metrics/*/history`` reads are served from these tables.
+
+Facebook, TikTok and Twitter ingest nothing; for them a hashtag row is the
+last live ``/metrics/hashtag`` answer of that day, kept so ``/history`` has
+something to chart, and their ``/metrics/hashtag`` stays a live (cached)
+upstream read. The same holds for Instagram's ``/metrics/hashtag``, which
+describes other accounts' public posts that no service stores.
+
+Requires the ``rollups`` extra (SQLAlchemy); import this module directly,
+it is not re-exported from ``common``.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+
+from .dto import EngagementPoint, EngagementSummary, HashtagInsights
+from .hashtags import normalize_tag
+
+logger = logging.getLogger(__name__)
+
+_RATE = "ROUND((likes + comments)::numeric / GREATEST(posts, 1), 3)::float"
+
+
+def create_rollup_engine(database_url: str | None) -> Engine | None:
+    if not database_url:
+        return None
+    return create_engine(database_url, future=True, pool_pre_ping=True)
+
+
+def record_hashtag_day(conn: Connection, platform: str, insights: HashtagInsights, day: date | None = None) -> None:
+    """Store today's snapshot of a hashtag; a later snapshot the same day replaces it.
+
+    Counts cover the snapshot's top posts only, not every post of the day.
+    """
+    posts = insights.top_posts
+    conn.execute(
+        text(
+            "INSERT INTO hashtag_engagement_daily"
+            " (platform, hashtag, day, posts, likes, comments, impressions, reach, avg_engagement_rate, updated_at)"
+            " VALUES (:platform, :hashtag, :day, :posts, :likes, :comments, :impressions, :reach, :rate, NOW())"
+            " ON CONFLICT (platform, hashtag, day) DO UPDATE SET"
+            " posts = EXCLUDED.posts, likes = EXCLUDED.likes, comments = EXCLUDED.comments,"
+            " impressions = EXCLUDED.impressions, reach = EXCLUDED.reach,"
+            " avg_engagement_rate = EXCLUDED.avg_engagement_rate, updated_at = NOW()"
+        ),
+        {
+            "platform": platform,
+            "hashtag": normalize_tag(insights.hashtag),
+            "day": day or datetime.now(timezone.utc).date(),
+            "posts": len(posts),
+            "likes": sum(post.like_count or 0 for post in posts),
+            "comments": sum(post.comments_count or 0 for post in posts),
+            "impressions": insights.impressions,
+            "reach": insights.reach,
+            "rate": insights.avg_engagement_rate,
+        },
+    )
+
+
+def record_hashtag_safely(engine: Engine | None, platform: str, insights: HashtagInsights) -> None:
+    """Best-effort variant for request handlers: rollups never fail a request."""
+    if engine is None:
+        return
+    try:
+        with engine.begin() as conn:
+            record_hashtag_day(conn, platform, insights)
+    except Exception as exc:
+        logger.warning("Failed to record %s hashtag rollup for '%s': %s", platform, insights.hashtag, exc)
+
+
+def record_hashtags_safely(engine: Engine | None, platform: str, insights: list[HashtagInsights]) -> None:
+    for item in insights:
+        record_hashtag_safely(engine, platform, item)
+
+
+def replace_hashtag_days(conn: Connection, platform: str, days: list[date], select_sql: str, params: dict) -> None:
+    """Recompute hashtag rollups for ``days`` from ``select_sql``.
+
+    ``select_sql`` must yield ``hashtag, day, posts, likes, comments``. The
+    platform's rows for those days are replaced rather than merged, so a tag
+    edited out of every caption of a day also drops out of that day.
+    """
+    conn.execute(
+        text("DELETE FROM hashtag_engagement_daily WHERE platform = :platform AND day = ANY(:days)"),
+        {"platform": platform, "days": days},
+    )
+    conn.execute(
+        text(
+            "INSERT INTO hashtag_engagement_daily"
+            " (platform, hashtag, day, posts, likes, comments, avg_engagement_rate, updated_at)"
+            f" SELECT :platform, hashtag, day, posts, likes, comments, {_RATE}, NOW()"
+            f" FROM ({select_sql}) AS source"
+            " ON CONFLICT (platform, hashtag, day) DO UPDATE SET"
+            " posts = EXCLUDED.posts, likes = EXCLUDED.likes, comments = EXCLUDED.comments,"
+            " avg_engagement_rate = EXCLUDED.avg_engagement_rate, updated_at = NOW()"
+        ),
+        {"platform": platform, **params},
+    )
+
+
+def hashtag_series(conn: Connection, platform: str, tag: str, days: int) -> list[EngagementPoint]:
+    rows = conn.execute(
+        text(
+            "SELECT day, posts, likes, comments, impressions, reach, avg_engagement_rate"
+            " FROM hashtag_engagement_daily"
+            " WHERE platform = :platform AND hashtag = :hashtag AND day >= :since"
+            " ORDER BY day"
+        ),
+        {"platform": platform, "hashtag": normalize_tag(tag), "since": _since(days)},
+    ).mappings()
+    return [EngagementPoint(**row) for row in rows]
+
+
+def upsert_account_days(conn: Connection, platform: str, account_id: str, select_sql: str, params: dict) -> None:
+    """Recompute account rollups from ``select_sql``.
+
+    ``select_sql`` must yield ``day, posts, likes, comments`` for the days to
+    refresh; callers pass only the days touched by an ingest, which keeps
+    maintenance incremental.
+    """
+    conn.execute(
+        text(
+            "INSERT INTO account_engagement_daily"
+            " (platform, account_id, day, posts, likes, comments, avg_engagement_rate, updated_at)"
+            f" SELECT :platform, :account_id, day, posts, likes, comments, {_RATE}, NOW()"
+            f" FROM ({select_sql}) AS source"
+            " ON CONFLICT (platform, account_id, day) DO UPDATE SET"
+            " posts = EXCLUDED.posts, likes = EXCLUDED.likes, comments = EXCLUDED.comments,"
+            " avg_engagement_rate = EXCLUDED.avg_engagement_rate, updated_at = NOW()"
+        ),
+        {"platform": platform, "account_id": account_id, **params},
+    )
+
+
+def account_series(conn: Connection, platform: str, account_id: str, days: int) -> list[EngagementPoint]:
+    rows = conn.execute(
+        text(
+            "SELECT day, posts, likes, comments, avg_engagement_rate"
+            " FROM account_engagement_daily"
+            " WHERE platform = :platform AND account_id = :account_id AND day >= :since"
+            " ORDER BY day"
+        ),
+        {"platform": platform, "account_id": account_id, "since": _since(days)},
+    ).mappings()
+    return [EngagementPoint(**row) for row in rows]
+
+
+def hashtag_summary(conn: Connection, platform: str, tag: str, days: int) -> EngagementSummary:
+    return _summary(
+        conn,
+        "hashtag_engagement_daily",
+        "hashtag = :hashtag",
+        {"platform": platform, "hashtag": normalize_tag(tag)},
+        days,
+    )
+
+
+def account_summary(conn: Connection, platform: str, account_id: str, days: int) -> EngagementSummary:
+    return _summary(
+        conn,
+        "account_engagement_daily",
+        "account_id = :account_id",
+        {"platform": platform, "account_id": account_id},
+        days,
+    )
+
+
+def _summary(conn: Connection, table: str, match: str, params: dict, days: int) -> EngagementSummary:
+    # One index range scan over at most ``days`` rows; the rate is taken over
+    # the totals, not averaged across days.
+    row = conn.execute(
+        text(
+            f"SELECT posts, likes, comments, {_RATE} AS avg_engagement_rate FROM ("
+            "SELECT COALESCE(SUM(posts), 0) AS posts, COALESCE(SUM(likes), 0) AS likes,"
+            " COALESCE(SUM(comments), 0) AS comments"
+            f" FROM {table} WHERE platform = :platform AND {match} AND day >= :since"
+            ") AS totals"
+        ),
+        {**params, "since": _since(days)},
+    ).mappings().one()
+    return EngagementSummary(days=days, **row)
+
+
+def _since(days: int) -> date:
+    return datetime.now(timezone.utc).date() - timedelta(days=days - 1)
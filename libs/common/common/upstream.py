@@ -0,0 +1,61 @@
+"""Upstream plumbing shared by the platform servers.
+
+``UpstreamSettings`` holds the connection-pool and response-cache settings;
+each server mixes it into its own ``Settings``. One pooled client per process
+reuses TLS sessions and keep-alive connections to the platform API across
+requests.
+
+Requires httpx (and the ``cache`` extra for Redis); import this module
+directly, it is not re-exported from ``common``.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import httpx
+from pydantic import BaseModel
+
+from .cache import ResponseCache
+
+
+class UpstreamSettings(BaseModel):
+    # Shared upstream connection pool, opened once per process.
+    HTTP_TIMEOUT: float = 30.0
+    HTTP_MAX_CONNECTIONS: int = 50
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    HTTP2: bool = True
+
+    # /metrics response cache; Redis shares entries between replicas.
+    CACHE_REDIS_URL: Optional[str] = None
+    CACHE_MAX_ENTRIES: int = 1024
+    CACHE_TTLS: dict[str, float] = {"metrics/hashtag": 300.0}
+    CACHE_STALE_SECONDS: float = 3600.0
+
+
+def http_limits(settings: UpstreamSettings) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def build_http_client(settings: UpstreamSettings) -> httpx.AsyncClient:
+    return httpx.AsyncClient(timeout=settings.HTTP_TIMEOUT, limits=http_limits(settings), http2=settings.HTTP2)
+
+
+def build_sync_http_client(settings: UpstreamSettings) -> httpx.Client:
+    """Blocking counterpart for work that runs in threads."""
+    return httpx.Client(timeout=settings.HTTP_TIMEOUT, limits=http_limits(settings), http2=settings.HTTP2)
+
+
+def build_cache(namespace: str, settings: UpstreamSettings) -> ResponseCache:
+    return ResponseCache(
+        namespace,
+        ttls=settings.CACHE_TTLS,
+        stale_seconds=settings.CACHE_STALE_SECONDS,
+        max_entries=settings.CACHE_MAX_ENTRIES,
+        redis_url=settings.CACHE_REDIS_URL,
+    )
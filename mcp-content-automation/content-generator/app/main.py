@@ -1,11 +1,67 @@
-from fastapi import FastAPI
+import hashlib
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
-import os
+from pydantic_settings import BaseSettings
 import httpx
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+from common.cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+class Settings(BaseSettings):
+    openai_api_key: str | None = None
+    openai_base_url: str = "https://api.openai.com/v1"
+    openai_model: str = "gpt-4o-mini"
+    http_timeout: float = 60.0
+
+    # Identical prompts (after normalisation) are served from the cache and
+    # concurrent duplicates share one completion. Unset Redis keeps it local.
+    cache_ttl_seconds: float = 3600.0
+    cache_max_entries: int = 2048
+    cache_redis_url: str | None = None
+
+    # Opt-in: also reuse captions for near-identical topics, found by
+    # embedding similarity. Costs one embeddings call per exact-cache miss.
+    semantic_cache: bool = False
+    semantic_threshold: float = 0.95
+    semantic_max_entries: int = 2048
+    embedding_model: str = "text-embedding-3-small"
+
+
+settings = Settings()
 
-app = FastAPI(title="Content Generator")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http = httpx.AsyncClient(
+        base_url=settings.openai_base_url,
+        headers={"Authorization": f"Bearer {settings.openai_api_key}"},
+        timeout=settings.http_timeout,
+    )
+    app.state.cache = ResponseCache(
+        "content-generator",
+        ttls={"captions": settings.cache_ttl_seconds},
+        stale_seconds=0,
+        max_entries=settings.cache_max_entries,
+        redis_url=settings.cache_redis_url,
+    )
+    app.state.semantic = None
+    if settings.semantic_cache:
+        from .semantic import SemanticIndex
+
+        app.state.semantic = SemanticIndex(settings.semantic_threshold, settings.semantic_max_entries)
+    try:
+        yield
+    finally:
+        await app.state.cache.close()
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="Content Generator", lifespan=lifespan)
 
 
 class GenReq(BaseModel):
@@ -15,22 +71,84 @@ class GenReq(BaseModel):
     n_variants: int = 3
 
 
-@app.post("/captions")
-def captions(req: GenReq):
-    prompt = f"""Write {req.n_variants} short {req.platform} captions
-in the voice: {req.brand_voice}. Topic: {req.topic}.
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def build_prompt(req: GenReq) -> str:
+    return f"""Write {req.n_variants} short {_normalize(req.platform).lower()} captions
+in the voice: {_normalize(req.brand_voice)}. Topic: {_normalize(req.topic)}.
 Add 5-8 trending, relevant hashtags at the end of each variant."""
-    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
+
+
+def prompt_params(prompt: str) -> dict:
+    """Cache params for a prompt: case and whitespace do not change the key."""
+    digest = hashlib.sha256(_normalize(prompt).casefold().encode("utf-8")).hexdigest()
+    return {"model": settings.openai_model, "prompt": digest}
+
+
+async def complete(http: httpx.AsyncClient, prompt: str, n_variants: int) -> list[str]:
     payload = {
-        "model": "gpt-4o-mini",
+        "model": settings.openai_model,
         "messages": [{"role": "user", "content": prompt}],
     }
-    response = httpx.post(
-        "https://api.openai.com/v1/chat/completions",
-        json=payload,
-        headers=headers,
-        timeout=60,
-    )
+    try:
+        response = await http.post("/chat/completions", json=payload)
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=502, detail=f"Completion failed: {exc}") from exc
     message = response.json()["choices"][0]["message"]["content"]
     variants = [variant.strip() for variant in message.split("\n\n") if variant.strip()]
-    return {"variants": variants[: req.n_variants]}
+    if not variants:
+        # Raised rather than returned so an empty answer is never cached.
+        raise HTTPException(status_code=502, detail="Completion returned no captions")
+    return variants[:n_variants]
+
+
+async def embed(http: httpx.AsyncClient, text: str) -> list[float] | None:
+    try:
+        response = await http.post("/embeddings", json={"model": settings.embedding_model, "input": text})
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        logger.warning("Embedding failed, skipping semantic lookup: %s", exc)
+        return None
+    return response.json()["data"][0]["embedding"]
+
+
+@app.post("/captions")
+async def captions(req: GenReq, request: Request):
+    cache: ResponseCache = request.app.state.cache
+    semantic = request.app.state.semantic
+    http = request.app.state.http
+    prompt = build_prompt(req)
+    params = prompt_params(prompt)
+
+    vector = None
+    if semantic is not None:
+        cached = await cache.peek("captions", params)
+        if cached is not None:
+            return {"variants": cached}
+        # Only the topic varies within a group, so that is what gets embedded.
+        group = prompt_params(build_prompt(req.model_copy(update={"topic": ""})))["prompt"]
+        vector = await embed(http, _normalize(req.topic).casefold())
+        if vector is not None:
+            similar = semantic.nearest(group, vector)
+            cached = await cache.peek("captions", similar) if similar is not None else None
+            if cached is not None:
+                semantic.record_hit()
+                return {"variants": cached}
+
+    variants = await cache.get_or_fetch(
+        "captions", params, lambda: complete(http, prompt, req.n_variants)
+    )
+    if vector is not None:
+        semantic.add(group, params["prompt"], vector, params)
+    return {"variants": variants}
+
+
+@app.get("/cache/stats")
+def cache_stats(request: Request):
+    stats = request.app.state.cache.stats()
+    if request.app.state.semantic is not None:
+        stats["semantic"] = request.app.state.semantic.stats()
+    return stats
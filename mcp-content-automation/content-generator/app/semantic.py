@@ -0,0 +1,78 @@
+"""Near-duplicate prompt lookup for the caption cache.
+
+Keeps the embeddings of recently generated prompts, grouped by the parts that
+must match exactly (model, platform, voice, variant count), and maps a new
+prompt to the cache params of the most similar one when the cosine
+similarity clears a threshold. Vectors are normalised on insert so a lookup
+is a single matrix-vector product per group. ``max_entries`` bounds the
+embeddings across all groups: the least recently used group gives up its
+oldest entry first, and empty groups are dropped. Requires ``numpy``.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticIndex:
+    def __init__(self, threshold: float = 0.95, max_entries: int = 2048):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._groups: OrderedDict[str, OrderedDict[str, tuple[np.ndarray, dict]]] = OrderedDict()
+        self._matrices: dict[str, np.ndarray | None] = {}
+        self._size = 0
+        self.hits = 0
+        self.lookups = 0
+
+    def nearest(self, group: str, vector: list[float]) -> dict | None:
+        """Cache params of the closest stored prompt, or None below the threshold."""
+        self.lookups += 1
+        entries = self._groups.get(group)
+        if not entries:
+            return None
+        self._groups.move_to_end(group)
+        matrix = self._matrices.get(group)
+        if matrix is None:
+            matrix = self._matrices[group] = np.stack([vec for vec, _ in entries.values()])
+        scores = matrix @ _unit(vector)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return list(entries.values())[best][1]
+
+    def record_hit(self) -> None:
+        """Count a lookup whose params were still in the cache."""
+        self.hits += 1
+
+    def add(self, group: str, key: str, vector: list[float], params: dict) -> None:
+        entries = self._groups.setdefault(group, OrderedDict())
+        self._groups.move_to_end(group)
+        self._size += key not in entries
+        entries[key] = (_unit(vector), params)
+        entries.move_to_end(key)
+        self._matrices[group] = None
+        while self._size > self.max_entries:
+            oldest, victims = next(iter(self._groups.items()))
+            victims.popitem(last=False)
+            self._size -= 1
+            self._matrices[oldest] = None
+            if not victims:
+                del self._groups[oldest]
+                del self._matrices[oldest]
+
+    def stats(self) -> dict:
+        return {
+            "entries": self._size,
+            "groups": len(self._groups),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "threshold": self.threshold,
+        }
+
+
+def _unit(vector: list[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
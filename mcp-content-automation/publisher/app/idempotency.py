@@ -0,0 +1,81 @@
+"""Idempotency records for publish requests.
+
+Each ``(idempotency key, platform)`` pair is claimed before publishing and
+then holds the outcome, so a retried request replays the earlier result
+instead of posting again. Pairs are tracked separately: after a partial
+failure, a retry only re-attempts the platforms that failed.
+
+Records live in Redis when a URL is configured (shared across replicas),
+otherwise in process memory.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+
+PENDING = {"status": "in_progress"}
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        redis_url: str | None = None,
+        ttl_seconds: int = 24 * 3600,
+        pending_ttl_seconds: int = 900,
+    ):
+        self.ttl_seconds = ttl_seconds
+        # Must outlast the slowest publish, or a retry could start a second one.
+        self.pending_ttl_seconds = pending_ttl_seconds
+        self._memory: dict[str, tuple[float, dict]] = {}
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+
+    @staticmethod
+    def key(idempotency_key: str, platform: str) -> str:
+        return f"idem:{platform}:{idempotency_key}"
+
+    async def begin(self, idempotency_key: str, platform: str) -> dict | None:
+        """Claim the pair; returns None when claimed, else the existing record."""
+        key = self.key(idempotency_key, platform)
+        if self._redis is None:
+            return self._begin_local(key)
+        while True:
+            if await self._redis.set(key, json.dumps(PENDING), nx=True, ex=self.pending_ttl_seconds):
+                return None
+            raw = await self._redis.get(key)
+            if raw is not None:
+                return json.loads(raw)
+            # Expired between SET and GET; try to claim again.
+
+    async def finish(self, idempotency_key: str, platform: str, outcome: dict) -> None:
+        key = self.key(idempotency_key, platform)
+        if self._redis is None:
+            self._memory[key] = (time.monotonic() + self.ttl_seconds, outcome)
+            return
+        await self._redis.set(key, json.dumps(outcome), ex=self.ttl_seconds)
+
+    async def abandon(self, idempotency_key: str, platform: str) -> None:
+        """Release a claim after a failed attempt so the next retry can run."""
+        key = self.key(idempotency_key, platform)
+        if self._redis is None:
+            self._memory.pop(key, None)
+            return
+        await self._redis.delete(key)
+
+    def _begin_local(self, key: str) -> dict | None:
+        now = time.monotonic()
+        existing = self._memory.get(key)
+        if existing is not None and existing[0] > now:
+            return existing[1]
+        self._memory[key] = (now + self.pending_ttl_seconds, PENDING)
+        if len(self._memory) > 10_000:
+            self._memory = {k: v for k, v in self._memory.items() if v[0] > now}
+        return None
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
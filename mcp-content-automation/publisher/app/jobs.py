@@ -0,0 +1,386 @@
+"""Background publish jobs.
+
+``POST /jobs`` stores a job record, queues its ID and returns right away.
+Workers claim queued IDs, run the per-platform publishes (including the
+Instagram container wait) and write the outcome back to the record. When a
+callback URL was given, the finished record is then POSTed there, signed
+with ``X-Publisher-Signature: sha256=<hmac>`` if a webhook secret is
+configured.
+
+With a Redis URL, records and the queue live in Redis and survive restarts:
+
+* queued IDs wait in the ``publish_jobs:queue`` sorted set, scored by when
+  they may run;
+* a claim moves one due ID into ``publish_jobs:processing`` in a single Lua
+  step, scored by a lease deadline, so each job runs on one worker of one
+  replica at a time;
+* IDs whose lease ran out (the replica died mid-publish) go back on the
+  queue at the next claim. Re-running a job is safe: its idempotency key
+  makes already-published platforms replay instead of posting again.
+
+Workers that are stopped mid-job put it straight back on the queue. Without
+Redis everything is kept in process memory and lost on restart.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# (platform, caption, image_url, video_url, idempotency_key) -> outcome
+PublishFn = Callable[[str, str, "str | None", "str | None", "str | None"], Awaitable[dict]]
+
+QUEUE_KEY = "publish_jobs:queue"
+PROCESSING_KEY = "publish_jobs:processing"
+
+FINISHED = ("succeeded", "partial", "failed")
+
+# KEYS: queue, processing. ARGV: now, lease deadline.
+CLAIM = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, id in ipairs(expired) do
+  redis.call('ZREM', KEYS[2], id)
+  redis.call('ZADD', KEYS[1], ARGV[1], id)
+end
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 1)
+if #due == 0 then
+  return false
+end
+redis.call('ZREM', KEYS[1], due[1])
+redis.call('ZADD', KEYS[2], ARGV[2], due[1])
+return due[1]
+"""
+
+# KEYS: idempotency key. ARGV: expected job ID, new job ID, ttl seconds.
+REBIND = """
+local current = redis.call('GET', KEYS[1])
+if current == false or current == ARGV[1] then
+  redis.call('SET', KEYS[1], ARGV[2], 'EX', tonumber(ARGV[3]))
+  return ARGV[2]
+end
+return current
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobStore:
+    def __init__(self, redis_url: str | None = None, ttl_seconds: int = 7 * 24 * 3600):
+        self.ttl_seconds = ttl_seconds
+        self._memory: dict[str, dict] = {}
+        self._keys: dict[str, str] = {}
+        self._queue: dict[str, float] = {}
+        self._processing: dict[str, float] = {}
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+            self._claim = self._redis.register_script(CLAIM)
+            self._rebind = self._redis.register_script(REBIND)
+
+    async def claim_key(self, idempotency_key: str, job_id: str) -> str:
+        """Bind a submission key to ``job_id``; returns the job already bound to it."""
+        if self._redis is None:
+            return self._keys.setdefault(idempotency_key, job_id)
+        key = f"publish_job_key:{idempotency_key}"
+        if await self._redis.set(key, job_id, nx=True, ex=self.ttl_seconds):
+            return job_id
+        existing = await self._redis.get(key)
+        if existing is None:
+            # Expired between the two calls; bind it without racing anyone.
+            return await self.rebind_key(idempotency_key, job_id, job_id)
+        return existing.decode()
+
+    async def rebind_key(self, idempotency_key: str, stale_job_id: str, job_id: str) -> str:
+        """Move a key off a job that no longer exists, unless another caller already did."""
+        if self._redis is None:
+            if self._keys.get(idempotency_key, stale_job_id) == stale_job_id:
+                self._keys[idempotency_key] = job_id
+            return self._keys[idempotency_key]
+        bound = await self._rebind(
+            keys=[f"publish_job_key:{idempotency_key}"], args=[stale_job_id, job_id, self.ttl_seconds]
+        )
+        return bound.decode() if isinstance(bound, bytes) else bound
+
+    async def save(self, job: dict) -> None:
+        job["updated_at"] = time.time()
+        if self._redis is None:
+            self._memory[job["job_id"]] = job
+            return
+        await self._redis.set(f"publish_job:{job['job_id']}", json.dumps(job), ex=self.ttl_seconds)
+
+    async def delete(self, job_id: str) -> None:
+        if self._redis is None:
+            self._memory.pop(job_id, None)
+            return
+        await self._redis.delete(f"publish_job:{job_id}")
+
+    async def get(self, job_id: str) -> dict | None:
+        if self._redis is None:
+            job = self._memory.get(job_id)
+            return json.loads(json.dumps(job)) if job is not None else None
+        raw = await self._redis.get(f"publish_job:{job_id}")
+        return json.loads(raw) if raw is not None else None
+
+    # -- queue -----------------------------------------------------------
+
+    async def enqueue(self, job_id: str, due: float) -> None:
+        """Queue ``job_id`` to run at ``due``, releasing any claim on it."""
+        if self._redis is None:
+            self._processing.pop(job_id, None)
+            self._queue[job_id] = due
+            return
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(PROCESSING_KEY, job_id)
+            pipe.zadd(QUEUE_KEY, {job_id: due})
+            await pipe.execute()
+
+    async def claim(self, lease_seconds: float) -> str | None:
+        now = time.time()
+        if self._redis is not None:
+            member = await self._claim(keys=[QUEUE_KEY, PROCESSING_KEY], args=[now, now + lease_seconds])
+            return member.decode() if member is not None else None
+        for job_id, deadline in list(self._processing.items()):
+            if deadline <= now:
+                del self._processing[job_id]
+                self._queue[job_id] = now
+        due = [job_id for job_id, at in self._queue.items() if at <= now]
+        if not due:
+            return None
+        job_id = min(due, key=self._queue.__getitem__)
+        del self._queue[job_id]
+        self._processing[job_id] = now + lease_seconds
+        return job_id
+
+    async def release(self, job_id: str) -> None:
+        if self._redis is None:
+            self._processing.pop(job_id, None)
+            return
+        await self._redis.zrem(PROCESSING_KEY, job_id)
+
+    async def depth(self) -> int:
+        if self._redis is None:
+            return len(self._queue)
+        return await self._redis.zcard(QUEUE_KEY)
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+
+
+class JobRunner:
+    def __init__(
+        self,
+        store: JobStore,
+        publish: PublishFn,
+        http: httpx.AsyncClient,
+        workers: int = 8,
+        max_queued: int = 1000,
+        lease_seconds: float = 600.0,
+        in_progress_retry_seconds: float = 30.0,
+        poll_interval: float = 1.0,
+        webhook_secret: str | None = None,
+        webhook_attempts: int = 3,
+    ):
+        self.store = store
+        self.publish = publish
+        self.http = http
+        self.workers = workers
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        self.in_progress_retry_seconds = in_progress_retry_seconds
+        self.poll_interval = poll_interval
+        self.webhook_secret = webhook_secret
+        self.webhook_attempts = webhook_attempts
+        self._wake = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self.counts = {"succeeded": 0, "partial": 0, "failed": 0, "requeued": 0}
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"publish-worker-{index}") for index in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self,
+        platforms: list[str],
+        content: dict[str, Any],
+        callback_url: str | None = None,
+        idempotency_key: str | None = None,
+    ) -> dict:
+        """Record and queue a job; a repeated ``idempotency_key`` returns the original job.
+
+        The record is saved before the key is bound, so a key pointing at a
+        missing record always means that job is gone (expired), never that
+        it is still being created.
+        """
+        if await self.store.depth() >= self.max_queued:
+            raise QueueFull()
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "platforms": platforms,
+            "content": content,
+            "idempotency_key": idempotency_key or job_id,
+            "callback_url": callback_url,
+            "results": {},
+            "runs": 0,
+            "created_at": time.time(),
+        }
+        await self.store.save(job)
+        if idempotency_key:
+            bound = await self.store.claim_key(idempotency_key, job_id)
+            while bound != job_id:
+                existing = await self.store.get(bound)
+                if existing is not None:
+                    await self.store.delete(job_id)
+                    return existing
+                # Take the key over from the vanished job unless a concurrent
+                # submit already has, then look at whatever it points to now.
+                bound = await self.store.rebind_key(idempotency_key, bound, job_id)
+        await self.store.enqueue(job_id, time.time())
+        self._wake.set()
+        return job
+
+    async def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": await self.store.depth(),
+            "max_queued": self.max_queued,
+            **self.counts,
+        }
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job_id = await self.store.claim(self.lease_seconds)
+            except Exception as exc:
+                logger.warning("Claiming a publish job failed: %s", exc)
+                job_id = None
+            if job_id is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                # Shutting down: hand the job to the next worker right away
+                # instead of leaving it until the lease expires.
+                await asyncio.shield(self._requeue(job_id, time.time()))
+                raise
+            except Exception as exc:
+                logger.exception("Publish job %s crashed: %s", job_id, exc)
+                await self._fail(job_id, repr(exc))
+
+    async def _run(self, job_id: str) -> None:
+        job = await self.store.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            # Expired, or finished by a worker whose lease had run out.
+            await self.store.release(job_id)
+            return
+        job["status"] = "running"
+        job["runs"] = job.get("runs", 0) + 1
+        await self.store.save(job)
+
+        content = job["content"]
+        outcomes = await asyncio.gather(
+            *(
+                self.publish(
+                    platform,
+                    content["caption"],
+                    content.get("image_url"),
+                    content.get("video_url"),
+                    job["idempotency_key"],
+                )
+                for platform in job["platforms"]
+            ),
+            return_exceptions=True,
+        )
+        outcomes = [
+            {"status": "failed", "error": repr(outcome), "retryable": True}
+            if isinstance(outcome, BaseException)
+            else outcome
+            for outcome in outcomes
+        ]
+        job["results"] = dict(zip(job["platforms"], outcomes))
+        if any(outcome["status"] == "in_progress" for outcome in outcomes):
+            # An earlier run is still publishing somewhere (or its claim has
+            # not expired yet); look again later rather than guess.
+            await self._requeue(job_id, time.time() + self.in_progress_retry_seconds, job)
+            return
+
+        failed = sum(1 for outcome in outcomes if outcome["status"] == "failed")
+        job["status"] = "succeeded" if not failed else "failed" if failed == len(outcomes) else "partial"
+        job["finished_at"] = time.time()
+        # Save before notifying so pollers see the result immediately.
+        await self.store.save(job)
+        await self.store.release(job_id)
+        self.counts[job["status"]] += 1
+        if job.get("callback_url"):
+            job["callback"] = await self._notify(job)
+            await self.store.save(job)
+
+    async def _requeue(self, job_id: str, due: float, job: dict | None = None) -> None:
+        try:
+            job = job or await self.store.get(job_id)
+            if job is not None:
+                job["status"] = "queued"
+                await self.store.save(job)
+            await self.store.enqueue(job_id, due)
+            self.counts["requeued"] += 1
+        except Exception:
+            logger.exception("Could not requeue publish job %s; it runs again when its lease expires", job_id)
+
+    async def _fail(self, job_id: str, error: str) -> None:
+        try:
+            job = await self.store.get(job_id)
+            if job is not None:
+                job.update(status="failed", error=error, finished_at=time.time())
+                await self.store.save(job)
+            await self.store.release(job_id)
+            self.counts["failed"] += 1
+        except Exception:
+            logger.exception("Could not record failure of publish job %s", job_id)
+
+    async def _notify(self, job: dict) -> dict:
+        body = json.dumps({key: value for key, value in job.items() if key != "callback"}).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.webhook_secret:
+            digest = hmac.new(self.webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+            headers["X-Publisher-Signature"] = f"sha256={digest}"
+        error = ""
+        for attempt in range(self.webhook_attempts):
+            if attempt:
+                await asyncio.sleep(2 ** (attempt - 1))
+            try:
+                response = await self.http.post(job["callback_url"], content=body, headers=headers, timeout=10)
+                if response.is_success:
+                    return {"delivered": True, "status_code": response.status_code}
+                error = f"HTTP {response.status_code}"
+            except httpx.HTTPError as exc:
+                error = repr(exc)
+        logger.warning("Webhook for publish job %s failed: %s", job["job_id"], error)
+        return {"delivered": False, "error": error}
@@ -1,14 +1,86 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+
+from fastapi import FastAPI, Header, HTTPException, Request, Response
 from pydantic import BaseModel
-import os
+from pydantic_settings import BaseSettings
 import httpx
 
-META_PAGE_ID = os.getenv("META_PAGE_ID")
-META_IG_BUSINESS_ID = os.getenv("META_IG_BUSINESS_ID")
-META_TOKEN = os.getenv("META_LONG_LIVED_TOKEN")
-BASE = "https://graph.facebook.com/v18.0"
+from .idempotency import IdempotencyStore
+from .jobs import JobRunner, JobStore, QueueFull
+from .platforms import PUBLISHERS, PublishError
+
+
+class Settings(BaseSettings):
+    meta_page_id: str | None = None
+    meta_ig_business_id: str | None = None
+    meta_long_lived_token: str | None = None
+
+    http_timeout: float = 60.0
+    http_max_connections: int = 50
+
+    # Instagram media containers are polled until FINISHED.
+    container_poll_initial: float = 1.0
+    container_poll_max: float = 10.0
+    container_timeout: float = 300.0
+
+    # Unset keeps idempotency records in process memory.
+    idempotency_redis_url: str | None = None
+    idempotency_ttl_seconds: int = 24 * 3600
+    idempotency_pending_ttl_seconds: int = 900
+
+    # Background publish jobs (POST /jobs); unset Redis keeps them in memory.
+    jobs_redis_url: str | None = None
+    jobs_ttl_seconds: int = 7 * 24 * 3600
+    publish_workers: int = 8
+    publish_max_queued: int = 1000
+    # A claimed job returns to the queue if its worker has not finished it
+    # by then (the replica died); must outlast the slowest publish.
+    jobs_lease_seconds: float = 600.0
+    jobs_in_progress_retry_seconds: float = 30.0
+    jobs_poll_interval: float = 1.0
+    webhook_secret: str | None = None
+    webhook_attempts: int = 3
+
+
+settings = Settings()
+
 
-app = FastAPI(title="Publisher")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http = httpx.AsyncClient(
+        timeout=settings.http_timeout,
+        limits=httpx.Limits(max_connections=settings.http_max_connections),
+    )
+    app.state.idempotency = IdempotencyStore(
+        settings.idempotency_redis_url,
+        ttl_seconds=settings.idempotency_ttl_seconds,
+        pending_ttl_seconds=settings.idempotency_pending_ttl_seconds,
+    )
+    app.state.jobs = JobRunner(
+        JobStore(settings.jobs_redis_url, ttl_seconds=settings.jobs_ttl_seconds),
+        partial(publish_to, app.state),
+        app.state.http,
+        workers=settings.publish_workers,
+        max_queued=settings.publish_max_queued,
+        lease_seconds=settings.jobs_lease_seconds,
+        in_progress_retry_seconds=settings.jobs_in_progress_retry_seconds,
+        poll_interval=settings.jobs_poll_interval,
+        webhook_secret=settings.webhook_secret,
+        webhook_attempts=settings.webhook_attempts,
+    )
+    app.state.jobs.start()
+    try:
+        yield
+    finally:
+        await app.state.jobs.stop()
+        await app.state.jobs.store.close()
+        await app.state.idempotency.close()
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="Publisher", lifespan=lifespan)
 
 
 class PublishReq(BaseModel):
@@ -18,25 +90,142 @@ class PublishReq(BaseModel):
     video_url: str | None = None
 
 
+class CrossPostReq(BaseModel):
+    platforms: list[str]
+    caption: str
+    image_url: str | None = None
+    video_url: str | None = None
+
+
+class JobReq(CrossPostReq):
+    callback_url: str | None = None
+
+
+async def publish_to(
+    state,
+    platform: str,
+    caption: str,
+    image_url: str | None,
+    video_url: str | None,
+    idempotency_key: str | None,
+) -> dict:
+    """Publish to one platform and return its outcome.
+
+    With an idempotency key, a repeated call returns the stored outcome
+    (``replayed``) or ``in_progress`` while the first attempt is running.
+    """
+    publisher = PUBLISHERS.get(platform)
+    if publisher is None:
+        return {"status": "stub"}
+
+    store: IdempotencyStore = state.idempotency
+    if idempotency_key:
+        previous = await store.begin(idempotency_key, platform)
+        if previous is not None:
+            return {**previous, "replayed": previous.get("status") == "published"}
+
+    try:
+        result = await publisher(state.http, settings, caption, image_url, video_url)
+    except PublishError as exc:
+        # An ambiguous failure keeps the claim until it expires: retries see
+        # in_progress rather than risking a second post.
+        if idempotency_key and not exc.ambiguous:
+            await store.abandon(idempotency_key, platform)
+        return {"status": "failed", "error": str(exc), "retryable": exc.retryable}
+    except BaseException as exc:
+        # Bugs and cancellation must not leave the claim pending for its TTL.
+        if idempotency_key:
+            await asyncio.shield(store.abandon(idempotency_key, platform))
+        if not isinstance(exc, Exception):
+            raise
+        return {"status": "failed", "error": repr(exc), "retryable": True}
+
+    outcome = {"status": "published", "result": result}
+    if idempotency_key:
+        await store.finish(idempotency_key, platform, outcome)
+    return outcome
+
+
+def as_outcome(result) -> dict:
+    """Per-platform outcome from a ``gather(..., return_exceptions=True)`` result."""
+    if isinstance(result, BaseException):
+        return {"status": "failed", "error": repr(result), "retryable": True}
+    return result
+
+
 @app.post("/publish")
-def publish(req: PublishReq):
-    if req.platform == "instagram":
-        media_create = f"{BASE}/{META_IG_BUSINESS_ID}/media"
-        create_res = httpx.post(
-            media_create,
-            data={
-                "caption": req.caption,
-                "image_url": req.image_url,
-                "access_token": META_TOKEN,
-            },
-            timeout=60,
-        ).json()
-        creation_id = create_res.get("id")
-        publish_res = httpx.post(
-            f"{BASE}/{META_IG_BUSINESS_ID}/media_publish",
-            data={"creation_id": creation_id, "access_token": META_TOKEN},
-            timeout=60,
-        ).json()
-        return {"platform": "instagram", "result": publish_res}
-
-    return {"platform": req.platform, "status": "stub"}
+async def publish(
+    req: PublishReq,
+    request: Request,
+    idempotency_key: str | None = Header(default=None),
+):
+    outcome = await publish_to(
+        request.app.state, req.platform, req.caption, req.image_url, req.video_url, idempotency_key
+    )
+    if outcome["status"] == "in_progress":
+        raise HTTPException(status_code=409, detail="A publish with this Idempotency-Key is in progress")
+    if outcome["status"] == "failed":
+        raise HTTPException(status_code=502 if outcome["retryable"] else 422, detail=outcome["error"])
+    return {"platform": req.platform, **outcome}
+
+
+@app.post("/crosspost")
+async def crosspost(
+    req: CrossPostReq,
+    request: Request,
+    idempotency_key: str | None = Header(default=None),
+):
+    """Publish one piece of content to several platforms concurrently.
+
+    Always returns per-platform outcomes; retry with the same
+    ``Idempotency-Key`` to re-attempt only the platforms that failed.
+    """
+    platforms = list(dict.fromkeys(req.platforms))
+    if not platforms:
+        raise HTTPException(status_code=422, detail="No platforms given")
+    outcomes = await asyncio.gather(
+        *(
+            publish_to(request.app.state, platform, req.caption, req.image_url, req.video_url, idempotency_key)
+            for platform in platforms
+        ),
+        return_exceptions=True,
+    )
+    return {"idempotency_key": idempotency_key, "results": dict(zip(platforms, map(as_outcome, outcomes)))}
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    req: JobReq,
+    request: Request,
+    response: Response,
+    idempotency_key: str | None = Header(default=None),
+):
+    """Queue a publish and return its job ID without waiting for it.
+
+    Poll ``GET /jobs/{job_id}`` or pass ``callback_url`` to receive the
+    finished job. Resubmitting with the same ``Idempotency-Key`` returns the
+    original job.
+    """
+    platforms = list(dict.fromkeys(req.platforms))
+    if not platforms:
+        raise HTTPException(status_code=422, detail="No platforms given")
+    content = {"caption": req.caption, "image_url": req.image_url, "video_url": req.video_url}
+    try:
+        job = await request.app.state.jobs.submit(platforms, content, req.callback_url, idempotency_key)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Publish queue is full; retry later")
+    response.headers["Location"] = f"/jobs/{job['job_id']}"
+    return {"job_id": job["job_id"], "status": job["status"], "status_url": f"/jobs/{job['job_id']}"}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, request: Request):
+    job = await request.app.state.jobs.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/stats")
+async def stats(request: Request):
+    return await request.app.state.jobs.stats()
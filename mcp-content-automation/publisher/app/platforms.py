@@ -0,0 +1,130 @@
+"""Async publishing flows per platform.
+
+Each publisher takes the shared HTTP client, the settings and the content,
+and returns the platform's response for the created post. Failures raise
+``PublishError``; ``retryable`` tells callers whether trying again can help
+(network errors, throttling, 5xx) or not (the platform rejected the post).
+``ambiguous`` marks a failure on the call that creates the post after the
+request went out: the post may exist, so it must not be blindly retried.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+GRAPH = "https://graph.facebook.com/v18.0"
+
+
+# Transport errors raised before the request reached the server.
+NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class PublishError(Exception):
+    def __init__(self, message: str, retryable: bool = True, ambiguous: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+        self.ambiguous = ambiguous
+
+
+async def _graph(
+    http: httpx.AsyncClient,
+    method: str,
+    path: str,
+    token: str,
+    creates_post: bool = False,
+    **fields: Any,
+) -> dict:
+    fields = {name: value for name, value in fields.items() if value is not None}
+    fields["access_token"] = token
+    try:
+        if method == "GET":
+            response = await http.get(f"{GRAPH}/{path}", params=fields)
+        else:
+            response = await http.post(f"{GRAPH}/{path}", data=fields)
+    except httpx.HTTPError as exc:
+        ambiguous = creates_post and not isinstance(exc, NOT_SENT)
+        raise PublishError(f"{path}: {exc!r}", ambiguous=ambiguous) from exc
+    if response.status_code == 429 or response.status_code >= 500:
+        raise PublishError(f"{path}: HTTP {response.status_code}")
+    if response.is_error:
+        try:
+            message = response.json().get("error", {}).get("message", response.text)
+        except ValueError:
+            message = response.text
+        raise PublishError(f"{path}: {message}", retryable=False)
+    return response.json()
+
+
+async def wait_for_container(http: httpx.AsyncClient, settings, creation_id: str) -> None:
+    """Poll an Instagram media container until it is ready to publish.
+
+    Backs off from ``container_poll_initial`` to ``container_poll_max``
+    seconds between checks and gives up after ``container_timeout``.
+    """
+    deadline = time.monotonic() + settings.container_timeout
+    delay = settings.container_poll_initial
+    while True:
+        container = await _graph(
+            http, "GET", creation_id, settings.meta_long_lived_token, fields="status_code"
+        )
+        status = container.get("status_code")
+        if status in (None, "FINISHED"):
+            return
+        if status in ("ERROR", "EXPIRED"):
+            raise PublishError(f"Media container {creation_id} is {status}", retryable=False)
+        if time.monotonic() + delay > deadline:
+            raise PublishError(
+                f"Media container {creation_id} still {status} after {settings.container_timeout}s"
+            )
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, settings.container_poll_max)
+
+
+async def publish_instagram(
+    http: httpx.AsyncClient, settings, caption: str, image_url: str | None, video_url: str | None
+) -> dict:
+    ig_id = settings.meta_ig_business_id
+    token = settings.meta_long_lived_token
+    if not (ig_id and token):
+        raise PublishError("Instagram publishing is not configured", retryable=False)
+    if video_url:
+        container = await _graph(
+            http, "POST", f"{ig_id}/media", token, caption=caption, media_type="REELS", video_url=video_url
+        )
+    else:
+        container = await _graph(http, "POST", f"{ig_id}/media", token, caption=caption, image_url=image_url)
+    creation_id = container.get("id")
+    if not creation_id:
+        raise PublishError("Instagram returned no media container id", retryable=False)
+    await wait_for_container(http, settings, creation_id)
+    return await _graph(
+        http, "POST", f"{ig_id}/media_publish", token, creates_post=True, creation_id=creation_id
+    )
+
+
+async def publish_facebook(
+    http: httpx.AsyncClient, settings, caption: str, image_url: str | None, video_url: str | None
+) -> dict:
+    page_id = settings.meta_page_id
+    token = settings.meta_long_lived_token
+    if not (page_id and token):
+        raise PublishError("Facebook publishing is not configured", retryable=False)
+    if video_url:
+        path, fields = f"{page_id}/videos", {"file_url": video_url, "description": caption}
+    elif image_url:
+        path, fields = f"{page_id}/photos", {"url": image_url, "caption": caption}
+    else:
+        path, fields = f"{page_id}/feed", {"message": caption}
+    return await _graph(http, "POST", path, token, creates_post=True, **fields)
+
+
+Publisher = Callable[..., Awaitable[dict]]
+
+PUBLISHERS: dict[str, Publisher] = {
+    "instagram": publish_instagram,
+    "facebook": publish_facebook,
+}
@@ -0,0 +1,255 @@
+"""Background dispatcher that forwards scheduled posts to the publisher.
+
+Job IDs wait in one sorted set per platform (``queue:{platform}``) scored by
+their due time; payloads live in the ``jobs`` hash (see ``jobs.py``). Every
+replica runs the same loop:
+
+* Due items are claimed with a Lua script that moves them into
+  ``processing:{platform}`` in one step, so each item goes to exactly one
+  replica. The processing score is a lease deadline; items whose lease runs
+  out (a replica died mid-publish) are put back on the queue.
+* Claimed items are forwarded by at most ``concurrency`` tasks. Network
+  errors, 429 and 5xx are retried with jittered backoff, up to
+  ``max_attempts``; other failures and exhausted retries are moved to
+  ``dead:{platform}``. A 409 (the publisher is still working on an earlier
+  attempt) is checked again later without counting as an attempt.
+* Between passes the loop sleeps until the earliest due item, capped by
+  ``poll_interval``. Enqueues on this replica and finished deliveries wake
+  it early.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+
+import httpx
+from redis.asyncio import Redis
+
+from common.ratelimit import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# KEYS: queue, processing. ARGV: now, limit, lease deadline.
+CLAIM_DUE = """
+local items = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, item in ipairs(items) do
+  redis.call('ZREM', KEYS[1], item)
+  redis.call('ZADD', KEYS[2], ARGV[3], item)
+end
+return items
+"""
+
+# KEYS: queue, processing. ARGV: now, limit.
+REQUEUE_EXPIRED = """
+local items = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, item in ipairs(items) do
+  redis.call('ZREM', KEYS[2], item)
+  redis.call('ZADD', KEYS[1], ARGV[1], item)
+end
+return #items
+"""
+
+
+JOBS_KEY = "jobs"
+
+
+def queue_key(platform: str) -> str:
+    return f"queue:{platform}"
+
+
+def processing_key(platform: str) -> str:
+    return f"processing:{platform}"
+
+
+def dead_key(platform: str) -> str:
+    return f"dead:{platform}"
+
+
+def attempts_key(platform: str) -> str:
+    return f"attempts:{platform}"
+
+
+class Dispatcher:
+    def __init__(
+        self,
+        redis: Redis,
+        http: httpx.AsyncClient,
+        publisher_url: str,
+        platforms: list[str],
+        concurrency: int = 16,
+        lease_seconds: float = 420.0,
+        max_attempts: int = 5,
+        retry_base_seconds: float = 2.0,
+        in_progress_retry_seconds: float = 30.0,
+        poll_interval: float = 1.0,
+    ):
+        self.redis = redis
+        self.http = http
+        self.publisher_url = publisher_url
+        self.platforms = list(platforms)
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.in_progress_retry_seconds = in_progress_retry_seconds
+        self.poll_interval = poll_interval
+        self._claim = redis.register_script(CLAIM_DUE)
+        self._requeue = redis.register_script(REQUEUE_EXPIRED)
+        self._wake = asyncio.Event()
+        self._loop_task: asyncio.Task | None = None
+        self._deliveries: set[asyncio.Task] = set()
+        self._next_platform = 0
+        self.stats = {"claimed": 0, "published": 0, "retried": 0, "dead": 0, "requeued": 0}
+
+    # -- lifecycle -------------------------------------------------------
+
+    def start(self) -> None:
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run(), name="scheduler-dispatch")
+
+    async def stop(self, grace_seconds: float = 10.0) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        if self._deliveries:
+            # Unfinished deliveries keep their lease and are requeued once it expires.
+            _, pending = await asyncio.wait(self._deliveries, timeout=grace_seconds)
+            for task in pending:
+                task.cancel()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    # -- claiming --------------------------------------------------------
+
+    async def run_once(self) -> int:
+        """Claim due items across platforms up to the free worker slots."""
+        now = time.time()
+        claimed = 0
+        # Rotate the starting platform so a busy queue cannot starve the rest.
+        order = self.platforms[self._next_platform :] + self.platforms[: self._next_platform]
+        self._next_platform = (self._next_platform + 1) % max(1, len(self.platforms))
+        for platform in order:
+            keys = [queue_key(platform), processing_key(platform)]
+            requeued = await self._requeue(keys=keys, args=[now, 100])
+            self.stats["requeued"] += requeued
+            free = self.concurrency - len(self._deliveries)
+            if free <= 0:
+                break
+            items = await self._claim(keys=keys, args=[now, free, now + self.lease_seconds])
+            for member in items:
+                task = asyncio.create_task(self._deliver(platform, member))
+                self._deliveries.add(task)
+                task.add_done_callback(self._delivery_done)
+            claimed += len(items)
+        self.stats["claimed"] += claimed
+        return claimed
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                await self.run_once()
+                delay = await self._next_delay()
+            except Exception as exc:
+                logger.warning("Scheduler dispatch pass failed: %s", exc)
+                delay = self.poll_interval
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _next_delay(self) -> float:
+        if len(self._deliveries) >= self.concurrency:
+            # Saturated; a finishing delivery wakes the loop.
+            return self.poll_interval
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for platform in self.platforms:
+                pipe.zrange(queue_key(platform), 0, 0, withscores=True)
+            heads = await pipe.execute()
+        due = [entries[0][1] for entries in heads if entries]
+        if not due:
+            return self.poll_interval
+        return max(0.0, min(self.poll_interval, min(due) - time.time()))
+
+    # -- delivery --------------------------------------------------------
+
+    def _delivery_done(self, task: asyncio.Task) -> None:
+        self._deliveries.discard(task)
+        self._wake.set()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Scheduled post delivery crashed: %s", task.exception())
+
+    async def _load_payload(self, member: bytes) -> dict | None:
+        raw = await self.redis.hget(JOBS_KEY, member)
+        if raw is not None:
+            return json.loads(raw)["payload"]
+        if member.startswith(b"{"):
+            # Entries queued before job IDs carried the payload as the member.
+            return json.loads(member)
+        return None
+
+    async def _deliver(self, platform: str, member: bytes) -> None:
+        payload = await self._load_payload(member)
+        if payload is None:
+            logger.warning("Dropping %s job %r without a payload", platform, member)
+            await self.redis.zrem(processing_key(platform), member)
+            return
+        # The job ID doubles as the publisher's idempotency key, so a retry
+        # after an ambiguous failure or an expired lease never posts twice.
+        headers = {} if member.startswith(b"{") else {"Idempotency-Key": member.decode()}
+        try:
+            response = await self.http.post(
+                f"{self.publisher_url}/publish", json={**payload, "platform": platform}, headers=headers
+            )
+        except httpx.HTTPError as exc:
+            await self._retry(platform, member, repr(exc))
+            return
+        if response.status_code == 409:
+            # An earlier attempt for this job is still publishing; check back
+            # without spending an attempt. The publisher's claim expires, so
+            # this cannot go on forever.
+            await self._requeue_at(platform, member, time.time() + self.in_progress_retry_seconds)
+            logger.info("%s post %s is still publishing; checking again later", platform, member)
+        elif response.status_code == 429 or response.status_code >= 500:
+            await self._retry(platform, member, f"HTTP {response.status_code}")
+        elif response.is_error:
+            await self._bury(platform, member, f"HTTP {response.status_code}")
+        else:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.zrem(processing_key(platform), member)
+                pipe.hdel(attempts_key(platform), member)
+                pipe.hdel(JOBS_KEY, member)
+                await pipe.execute()
+            self.stats["published"] += 1
+
+    async def _retry(self, platform: str, member: bytes, reason: str) -> None:
+        attempts = await self.redis.hincrby(attempts_key(platform), member, 1)
+        if attempts >= self.max_attempts:
+            await self._bury(platform, member, f"{reason} after {attempts} attempts")
+            return
+        due = time.time() + backoff_delay(attempts, base=self.retry_base_seconds, cap=300.0)
+        await self._requeue_at(platform, member, due)
+        self.stats["retried"] += 1
+        logger.info("Retrying %s post (attempt %d): %s", platform, attempts, reason)
+
+    async def _requeue_at(self, platform: str, member: bytes, due: float) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(processing_key(platform), member)
+            pipe.zadd(queue_key(platform), {member: due})
+            await pipe.execute()
+
+    async def _bury(self, platform: str, member: bytes, reason: str) -> None:
+        # The payload stays in the jobs hash so dead jobs can be inspected.
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(processing_key(platform), member)
+            pipe.hdel(attempts_key(platform), member)
+            pipe.zadd(dead_key(platform), {member: time.time()})
+            await pipe.execute()
+        self.stats["dead"] += 1
+        logger.warning("Gave up on %s post: %s", platform, reason)
@@ -0,0 +1,165 @@
+"""Scheduled job storage.
+
+Payloads live once in the ``jobs`` hash, keyed by job ID, next to their
+platform and due time. Per-platform queues only hold job IDs scored by due
+time, so identical payloads stay separate jobs and queue size does not grow
+with payload size. Bulk loads go out in pipelined chunks.
+"""
+
+from __future__ import annotations
+
+import json
+import uuid
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+
+from .dispatcher import JOBS_KEY, attempts_key, dead_key, processing_key, queue_key
+
+PIPELINE_CHUNK = 1000
+
+# KEYS: jobs hash, target queue, then the queue, processing, dead and
+# attempts keys of the platform the ID was last stored under.
+# ARGV: job id, record, due time, that platform ("" for a new ID).
+# Re-enqueueing an existing ID first takes it off the queues of its previous
+# platform, so a platform change never leaves a copy behind, and revives it
+# if it was dead-lettered. Returns 0, leaving it alone, when the ID is being
+# dispatched right now, and -1 when its platform changed since the caller
+# looked it up (the caller retries with fresh keys).
+ENQUEUE = """
+local previous = redis.call('HGET', KEYS[1], ARGV[1])
+local platform = previous and cjson.decode(previous)['platform'] or ''
+if platform ~= ARGV[4] then
+  return -1
+end
+if previous then
+  if redis.call('ZSCORE', KEYS[4], ARGV[1]) then
+    return 0
+  end
+  redis.call('ZREM', KEYS[3], ARGV[1])
+  redis.call('ZREM', KEYS[5], ARGV[1])
+  redis.call('HDEL', KEYS[6], ARGV[1])
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+return 1
+"""
+
+# KEYS: queue. ARGV: job id, new due time. Only moves jobs still queued.
+RESCHEDULE = """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+  redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+  return 1
+end
+return 0
+"""
+
+
+@dataclass
+class Job:
+    platform: str
+    when_epoch: float
+    payload: dict
+    job_id: str = ""
+
+    def record(self) -> str:
+        return json.dumps({"platform": self.platform, "when_epoch": self.when_epoch, "payload": self.payload})
+
+
+async def enqueue_many(redis: Redis, jobs: list[Job]) -> tuple[list[str], list[str]]:
+    """Store and queue jobs, two round-trips per ``PIPELINE_CHUNK`` jobs.
+
+    Jobs without an ID get a random one; re-enqueueing an existing ID
+    replaces its platform, payload and due time. Returns the queued IDs and
+    the IDs skipped because they are being dispatched right now.
+    """
+    script = redis.register_script(ENQUEUE)
+    queued: list[str] = []
+    claimed: list[str] = []
+    for job in jobs:
+        job.job_id = job.job_id or uuid.uuid4().hex
+    pending = list(jobs)
+    while pending:
+        chunk, pending = pending[:PIPELINE_CHUNK], pending[PIPELINE_CHUNK:]
+        # The script only touches keys it is given, so look up each ID's
+        # current platform first; -1 means it changed in between.
+        previous = await redis.hmget(JOBS_KEY, [job.job_id for job in chunk])
+        async with redis.pipeline(transaction=False) as pipe:
+            for job, raw in zip(chunk, previous):
+                platform = json.loads(raw)["platform"] if raw is not None else ""
+                old = platform or job.platform
+                await script(
+                    keys=[
+                        JOBS_KEY,
+                        queue_key(job.platform),
+                        queue_key(old),
+                        processing_key(old),
+                        dead_key(old),
+                        attempts_key(old),
+                    ],
+                    args=[job.job_id, job.record(), job.when_epoch, platform],
+                    client=pipe,
+                )
+            results = await pipe.execute()
+        for job, result in zip(chunk, results):
+            if result == -1:
+                pending.append(job)
+            else:
+                (queued if result else claimed).append(job.job_id)
+    return queued, claimed
+
+
+async def get_job(redis: Redis, job_id: str) -> dict | None:
+    raw = await redis.hget(JOBS_KEY, job_id)
+    if raw is None:
+        return None
+    record = json.loads(raw)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.zscore(queue_key(record["platform"]), job_id)
+        pipe.zscore(dead_key(record["platform"]), job_id)
+        queued, dead = await pipe.execute()
+    status = "queued" if queued is not None else "dead" if dead is not None else "dispatching"
+    record.update(job_id=job_id, status=status)
+    return record
+
+
+async def cancel(redis: Redis, job_id: str) -> str | None:
+    """Remove a queued job.
+
+    Returns "cancelled", "dispatching" if it was already claimed, "dead" if
+    it was dead-lettered, or None if the ID is unknown.
+    """
+    raw = await redis.hget(JOBS_KEY, job_id)
+    if raw is None:
+        return None
+    platform = json.loads(raw)["platform"]
+    # ZREM races the dispatcher's claim script; whichever removes the ID wins.
+    if not await redis.zrem(queue_key(platform), job_id):
+        return await _unqueued_status(redis, platform, job_id)
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hdel(JOBS_KEY, job_id)
+        pipe.hdel(attempts_key(platform), job_id)
+        await pipe.execute()
+    return "cancelled"
+
+
+async def _unqueued_status(redis: Redis, platform: str, job_id: str) -> str:
+    return "dead" if await redis.zscore(dead_key(platform), job_id) is not None else "dispatching"
+
+
+async def reschedule(redis: Redis, job_id: str, when_epoch: float) -> str | None:
+    """Move a queued job to a new due time.
+
+    Returns "rescheduled", "dispatching", "dead" or None, as ``cancel`` does.
+    """
+    raw = await redis.hget(JOBS_KEY, job_id)
+    if raw is None:
+        return None
+    record = json.loads(raw)
+    move = redis.register_script(RESCHEDULE)
+    moved = await move(keys=[queue_key(record["platform"])], args=[job_id, when_epoch])
+    if not moved:
+        return await _unqueued_status(redis, record["platform"], job_id)
+    record["when_epoch"] = when_epoch
+    await redis.hset(JOBS_KEY, job_id, json.dumps(record))
+    return "rescheduled"
@@ -1,38 +1,174 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
-import os
-import json
-import time
-import redis
+from pydantic_settings import BaseSettings
+import httpx
+import redis.asyncio as redis
+
+from .dispatcher import Dispatcher, dead_key, processing_key, queue_key
+from .jobs import Job, cancel, enqueue_many, get_job, reschedule
+
+
+class Settings(BaseSettings):
+    redis_host: str = "redis"
+    redis_port: int = 6379
+    publisher_url: str = "http://publisher:8000"
+    platforms: list[str] = ["instagram", "facebook", "twitter", "tiktok"]
+
+    # Background dispatch; disable to drive it through /tick only.
+    dispatch_enabled: bool = True
+    dispatch_concurrency: int = 16
+    # The publisher may wait up to its container_timeout (300s) for a reel
+    # to process, so the request timeout must outlast that, and the lease
+    # must outlast the request, or a slow publish can be claimed twice.
+    lease_seconds: float = 420.0
+    max_attempts: int = 5
+    retry_base_seconds: float = 2.0
+    # 409 (an earlier attempt is still publishing) is polled at this
+    # interval without using up max_attempts.
+    in_progress_retry_seconds: float = 30.0
+    poll_interval: float = 1.0
+    publish_timeout: float = 360.0
+
+    bulk_max_items: int = 10_000
+
+
+settings = Settings()
 
-r = redis.Redis(
-    host=os.getenv("REDIS_HOST", "redis"),
-    port=int(os.getenv("REDIS_PORT", "6379")),
-)
 
-app = FastAPI(title="Scheduler")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.redis = redis.Redis(host=settings.redis_host, port=settings.redis_port)
+    app.state.http = httpx.AsyncClient(
+        timeout=settings.publish_timeout,
+        limits=httpx.Limits(max_connections=settings.dispatch_concurrency),
+    )
+    app.state.dispatcher = Dispatcher(
+        app.state.redis,
+        app.state.http,
+        settings.publisher_url,
+        settings.platforms,
+        concurrency=settings.dispatch_concurrency,
+        lease_seconds=settings.lease_seconds,
+        max_attempts=settings.max_attempts,
+        retry_base_seconds=settings.retry_base_seconds,
+        in_progress_retry_seconds=settings.in_progress_retry_seconds,
+        poll_interval=settings.poll_interval,
+    )
+    if settings.dispatch_enabled:
+        app.state.dispatcher.start()
+    try:
+        yield
+    finally:
+        await app.state.dispatcher.stop()
+        await app.state.http.aclose()
+        await app.state.redis.aclose()
+
+
+app = FastAPI(title="Scheduler", lifespan=lifespan)
 
 
 class ScheduleReq(BaseModel):
     platform: str
     when_epoch: int
     payload: dict
+    # Optional caller-chosen ID; re-enqueueing it replaces the job.
+    job_id: str | None = None
+
+
+class BulkScheduleReq(BaseModel):
+    items: list[ScheduleReq]
+
+
+class RescheduleReq(BaseModel):
+    when_epoch: int
+
+
+def _jobs(items: list[ScheduleReq]) -> list[Job]:
+    unknown = sorted({item.platform for item in items} - set(settings.platforms))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown platform(s): {', '.join(unknown)}")
+    return [Job(item.platform, item.when_epoch, item.payload, item.job_id or "") for item in items]
+
+
+def _check_unqueued(status: str | None) -> None:
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or already published job")
+    if status == "dispatching":
+        raise HTTPException(status_code=409, detail="Job is already being dispatched")
+    if status == "dead":
+        raise HTTPException(status_code=409, detail="Job failed and is in the dead-letter queue; re-enqueue it to retry")
+
+
+@app.get("/healthz")
+async def healthz(request: Request):
+    await request.app.state.redis.ping()
+    return {"service": "scheduler", "ok": True}
 
 
 @app.post("/enqueue")
-def enqueue(req: ScheduleReq):
-    key = f"queue:{req.platform}"
-    r.zadd(key, {json.dumps(req.payload): req.when_epoch})
-    return {"queued": True}
+async def enqueue(req: ScheduleReq, request: Request):
+    queued, claimed = await enqueue_many(request.app.state.redis, _jobs([req]))
+    if claimed:
+        raise HTTPException(status_code=409, detail="Job is already being dispatched")
+    request.app.state.dispatcher.wake()
+    return {"queued": True, "job_id": queued[0]}
+
+
+@app.post("/enqueue/bulk")
+async def enqueue_bulk(req: BulkScheduleReq, request: Request):
+    """Queue a whole content calendar with pipelined writes.
+
+    Items whose ID is being dispatched right now are skipped and listed
+    under ``conflicts``.
+    """
+    if len(req.items) > settings.bulk_max_items:
+        raise HTTPException(status_code=413, detail=f"At most {settings.bulk_max_items} items per request")
+    job_ids, conflicts = await enqueue_many(request.app.state.redis, _jobs(req.items))
+    request.app.state.dispatcher.wake()
+    return {"queued": len(job_ids), "job_ids": job_ids, "conflicts": conflicts}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, request: Request):
+    job = await get_job(request.app.state.redis, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or already published job")
+    return job
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, request: Request):
+    _check_unqueued(await cancel(request.app.state.redis, job_id))
+    return {"cancelled": True, "job_id": job_id}
+
+
+@app.post("/jobs/{job_id}/reschedule")
+async def reschedule_job(job_id: str, req: RescheduleReq, request: Request):
+    _check_unqueued(await reschedule(request.app.state.redis, job_id, req.when_epoch))
+    request.app.state.dispatcher.wake()
+    return {"rescheduled": True, "job_id": job_id, "when_epoch": req.when_epoch}
 
 
 @app.post("/tick")
-def tick():
-    now = int(time.time())
-    for platform in ["instagram", "facebook", "twitter", "tiktok"]:
-        key = f"queue:{platform}"
-        items = r.zrangebyscore(key, 0, now)
-        for item in items:
-            r.zrem(key, item)
-            # TODO: forward to publisher service asynchronously
-    return {"ok": True}
+async def tick(request: Request):
+    """Run one claim pass now; the background dispatcher does this continuously."""
+    claimed = await request.app.state.dispatcher.run_once()
+    return {"ok": True, "claimed": claimed}
+
+
+@app.get("/stats")
+async def stats(request: Request):
+    r = request.app.state.redis
+    async with r.pipeline(transaction=False) as pipe:
+        for platform in settings.platforms:
+            pipe.zcard(queue_key(platform))
+            pipe.zcard(processing_key(platform))
+            pipe.zcard(dead_key(platform))
+        counts = await pipe.execute()
+    queues = {
+        platform: dict(zip(("queued", "processing", "dead"), counts[index * 3 : index * 3 + 3]))
+        for index, platform in enumerate(settings.platforms)
+    }
+    return {"queues": queues, "dispatcher": request.app.state.dispatcher.stats}
@@ -1,4 +1,8 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 import httpx
@@ -8,10 +12,41 @@ class Settings(BaseSettings):
     instagram_server_url: str = "http://instagram-server:8000"
     sentiment_analyzer_url: str = "http://sentiment-analyzer:8000"
     trend_detector_url: str = "http://trend-detector:8000"
+    ingestion_coordinator_url: str = "http://ingestion-coordinator:8000"
+
+    window_days: int = 7
+    max_media: int = 1000
+    media_page_size: int = 500
+
+    http_timeout: float = 30.0
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2: bool = False
 
 
 settings = Settings()
-app = FastAPI(title="Insights Engine")
+
+
+def build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    return httpx.AsyncClient(timeout=settings.http_timeout, limits=limits, http2=settings.http2)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http = build_client()
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="Insights Engine", lifespan=lifespan)
 
 
 class InsightReq(BaseModel):
@@ -19,55 +54,91 @@ class InsightReq(BaseModel):
     hashtag: str | None = None
 
 
+async def _post_texts(client: httpx.AsyncClient, url: str, texts: list[str]) -> dict:
+    response = await client.post(url, json={"texts": texts})
+    response.raise_for_status()
+    return response.json()
+
+
+async def _instagram_captions(client: httpx.AsyncClient) -> list[str]:
+    """Read captions of stored media in the insight window, page by page.
+
+    Goes through instagram-server's read-only ``/media`` endpoint, so an
+    insights run never triggers a Graph API fetch or a database write.
+    """
+    captions: list[str] = []
+    params: dict = {"days": settings.window_days, "limit": settings.media_page_size}
+    while len(captions) < settings.max_media:
+        media_response = await client.get(f"{settings.instagram_server_url}/media", params=params)
+        media_response.raise_for_status()
+        media = media_response.json()
+        captions.extend(item.get("caption") or "" for item in media.get("items", []))
+        if not media.get("next_cursor"):
+            break
+        params["cursor"] = media["next_cursor"]
+    return captions[: settings.max_media]
+
+
+async def _coordinator_captions(client: httpx.AsyncClient, platform: str) -> tuple[list[str], dict]:
+    """Collect captions from the ingestion coordinator's NDJSON stream.
+
+    ``platform="all"`` fans out to every enabled platform; partial results are
+    kept and the per-platform status is returned alongside the captions.
+    """
+    params = {"limit": 100}
+    if platform != "all":
+        params["platforms"] = platform
+    captions: list[str] = []
+    sources: dict = {}
+    async with client.stream(
+        "GET", f"{settings.ingestion_coordinator_url}/media/recent", params=params
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("type") == "item":
+                captions.append(record["item"].get("caption") or "")
+            elif record.get("type") == "summary":
+                sources = record.get("platforms", {})
+    return captions, sources
+
+
 @app.post("/weekly")
-def weekly(req: InsightReq):
-    with httpx.Client(timeout=30) as client:
-        try:
-            media_response = client.get(
-                f"{settings.instagram_server_url}/ingest/recent_media?limit=100"
-            )
-            media_response.raise_for_status()
-            media = media_response.json()
-
-            payload: list[dict] = []
-            if isinstance(media, dict):
-                payload = (
-                    media.get("items")
-                    or media.get("ingested")
-                    or media.get("data")
-                    or []
-                )
-
-            captions = [item.get("caption", "") for item in payload]
-
-            sent_response = client.post(
-                f"{settings.sentiment_analyzer_url}/analyze",
-                json={"texts": captions},
-            )
-            sent_response.raise_for_status()
-            sent = sent_response.json()
-
-            clusters_response = client.post(
-                f"{settings.trend_detector_url}/clusters",
-                json={"texts": captions},
-            )
-            clusters_response.raise_for_status()
-            clusters = clusters_response.json()
-
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Service unavailable: {e}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+async def weekly(req: InsightReq, request: Request):
+    client: httpx.AsyncClient = request.app.state.http
+    sources: dict | None = None
+    try:
+        if req.platform == "instagram":
+            captions = await _instagram_captions(client)
+        else:
+            captions, sources = await _coordinator_captions(client, req.platform)
+
+        # Sentiment and clustering are independent, so run them side by side.
+        sent, clusters = await asyncio.gather(
+            _post_texts(client, f"{settings.sentiment_analyzer_url}/analyze", captions),
+            _post_texts(client, f"{settings.trend_detector_url}/clusters", captions),
+        )
+
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"Service unavailable: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
     results = sent.get("results", []) if isinstance(sent, dict) else []
     positives = sum(1 for r in results if r.get("label") == "POSITIVE")
     avg_pos = positives / max(1, len(results))
 
+    summary = {
+        "platform": req.platform,
+        "period": f"last_{settings.window_days}_days",
+        "avg_positive": round(avg_pos, 3),
+    }
+    if sources is not None:
+        summary["sources"] = sources
+
     return {
-        "summary": {
-            "platform": req.platform,
-            "period": "last_7_days",
-            "avg_positive": round(avg_pos, 3),
-        },
+        "summary": summary,
         "clusters": clusters.get("clusters", []) if isinstance(clusters, dict) else [],
     }
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+from transformers import pipeline
+
+logger = logging.getLogger(__name__)
+
+TASK = "sentiment-analysis"
+BACKENDS = ("torch", "onnx")
+
+
+def model_id(model_name: str, backend: str = "torch", quantize: bool = False) -> str:
+    """Identity of the loaded model, used to keep cache entries per backend apart."""
+    if backend == "torch":
+        return model_name
+    return f"{model_name}@{backend}{'-int8' if quantize else ''}"
+
+
+def load_pipeline(
+    model_name: str,
+    backend: str = "torch",
+    quantize: bool = False,
+    onnx_dir: str = "/tmp/onnx-models",
+):
+    """Build a text-classification pipeline on the requested runtime.
+
+    Both backends return the same ``[{"label", "score"}]`` output since the
+    ONNX path reuses the model config and tokenizer through ``optimum``.
+    """
+    if backend == "torch":
+        return pipeline(TASK, model=model_name)
+    if backend == "onnx":
+        return _onnx_pipeline(model_name, quantize, Path(onnx_dir))
+    raise ValueError(f"Unknown sentiment backend {backend!r}, expected one of {BACKENDS}")
+
+
+def _onnx_pipeline(model_name: str, quantize: bool, onnx_dir: Path):
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    export_dir = onnx_dir / model_name.replace("/", "__")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if not (export_dir / "model.onnx").exists():
+        logger.info("Exporting %s to ONNX in %s", model_name, export_dir)
+        model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+        model.save_pretrained(export_dir)
+        tokenizer.save_pretrained(export_dir)
+
+    if not quantize:
+        model = ORTModelForSequenceClassification.from_pretrained(export_dir)
+        return pipeline(TASK, model=model, tokenizer=tokenizer)
+
+    quantized_dir = export_dir / "int8"
+    if not (quantized_dir / "model_quantized.onnx").exists():
+        logger.info("Quantizing %s to dynamic int8", model_name)
+        quantizer = ORTQuantizer.from_pretrained(export_dir)
+        config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=quantized_dir, quantization_config=config)
+    model = ORTModelForSequenceClassification.from_pretrained(
+        quantized_dir, file_name="model_quantized.onnx"
+    )
+    return pipeline(TASK, model=model, tokenizer=tokenizer)
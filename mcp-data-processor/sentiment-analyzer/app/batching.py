@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+Predict = Callable[[list[str]], list[Any]]
+
+
+class _Job:
+    __slots__ = ("results", "remaining", "future")
+
+    def __init__(self, size: int, future: asyncio.Future):
+        self.results: list[Any] = [None] * size
+        self.remaining = size
+        self.future = future
+
+
+class MicroBatcher:
+    """Coalesce texts from concurrent callers into bounded inference batches.
+
+    A batch is flushed once it holds ``max_batch_size`` texts or the oldest
+    text has waited ``max_wait_ms``. Inference runs in a worker thread so the
+    event loop keeps accepting requests while the model is busy, and large
+    submissions are naturally split across several batches.
+    """
+
+    def __init__(self, predict: Predict, max_batch_size: int = 32, max_wait_ms: float = 10.0):
+        self.predict = predict
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: asyncio.Queue[tuple[_Job, int, str]] = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, texts: list[str]) -> list[Any]:
+        if not texts:
+            return []
+        job = _Job(len(texts), asyncio.get_running_loop().create_future())
+        for index, text in enumerate(texts):
+            self._queue.put_nowait((job, index, text))
+        return await job.future
+
+    async def _collect(self) -> list[tuple[_Job, int, str]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Skip work for callers that already went away.
+            batch = [entry for entry in batch if not entry[0].future.done()]
+            if not batch:
+                continue
+            try:
+                outputs = await loop.run_in_executor(None, self.predict, [text for _, _, text in batch])
+            except Exception as exc:
+                logger.exception("Batch inference failed for %d texts", len(batch))
+                for job, _, _ in batch:
+                    if not job.future.done():
+                        job.future.set_exception(exc)
+                continue
+
+            for (job, index, _), output in zip(batch, outputs):
+                if job.future.done():
+                    continue
+                job.results[index] = output
+                job.remaining -= 1
+                if job.remaining == 0:
+                    job.future.set_result(job.results)
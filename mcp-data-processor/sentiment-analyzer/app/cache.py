@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Classification cache keyed by ``sha256(model + text)``.
+
+    Lookups hit an in-process LRU first and fall back to an optional Redis
+    tier shared between replicas. Redis errors are logged and treated as
+    misses so the cache can never take the analyzer down.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = 50_000,
+        redis_url: str | None = None,
+        ttl_seconds: int | None = None,
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lru: OrderedDict[str, Any] = OrderedDict()
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+        return f"sentiment:{digest}"
+
+    async def get_many(self, texts: list[str]) -> list[Any | None]:
+        keys = [self.key(text) for text in texts]
+        found: list[Any | None] = [None] * len(keys)
+        remote: list[int] = []
+        for index, key in enumerate(keys):
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                found[index] = self._lru[key]
+            else:
+                remote.append(index)
+
+        if remote and self._redis is not None:
+            try:
+                values = await self._redis.mget([keys[i] for i in remote])
+            except Exception as exc:
+                logger.warning("Redis cache lookup failed: %s", exc)
+                values = [None] * len(remote)
+            for index, raw in zip(remote, values):
+                if raw is not None:
+                    found[index] = json.loads(raw)
+                    self._remember(keys[index], found[index])
+
+        hits = sum(1 for value in found if value is not None)
+        self.hits += hits
+        self.misses += len(found) - hits
+        return found
+
+    async def set_many(self, results: dict[str, Any]) -> None:
+        if not results:
+            return
+        keyed = {self.key(text): value for text, value in results.items()}
+        for key, value in keyed.items():
+            self._remember(key, value)
+        if self._redis is None:
+            return
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key, value in keyed.items():
+                    pipe.set(key, json.dumps(value), ex=self.ttl_seconds)
+                await pipe.execute()
+        except Exception as exc:
+            logger.warning("Redis cache write failed: %s", exc)
+
+    def _remember(self, key: str, value: Any) -> None:
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "redis": self._redis is not None,
+        }
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
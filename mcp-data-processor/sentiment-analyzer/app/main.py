@@ -1,16 +1,107 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from transformers import pipeline
+from pydantic_settings import BaseSettings
+
+from common import HealthResponse
+
+from .backends import load_pipeline, model_id
+from .batching import MicroBatcher
+from .cache import ResultCache
+from .model import ModelHandle
+
+
+class Settings(BaseSettings):
+    model_name: str = "cardiffnlp/twitter-roberta-base-sentiment"
+    # "torch" runs the fp32 transformers model, "onnx" runs an exported graph
+    # on onnxruntime, optionally with dynamic int8 quantization.
+    backend: str = "torch"
+    onnx_quantize: bool = False
+    onnx_dir: str = "/tmp/onnx-models"
+
+    warmup_batch_size: int = 8
+    warmup_text: str = "Loved the rooftop bar and the friendly staff! #travel"
+
+    max_batch_size: int = 32
+    max_wait_ms: float = 10.0
+
+    cache_max_entries: int = 50_000
+    cache_redis_url: str | None = None
+    cache_ttl_seconds: int | None = 30 * 24 * 3600
+
+
+settings = Settings()
+model = ModelHandle(
+    partial(
+        load_pipeline,
+        settings.model_name,
+        backend=settings.backend,
+        quantize=settings.onnx_quantize,
+        onnx_dir=settings.onnx_dir,
+    ),
+    warmup_texts=[settings.warmup_text] * settings.warmup_batch_size,
+)
+batcher = MicroBatcher(model, settings.max_batch_size, settings.max_wait_ms)
+cache = ResultCache(
+    model_id(settings.model_name, settings.backend, settings.onnx_quantize),
+    max_entries=settings.cache_max_entries,
+    redis_url=settings.cache_redis_url,
+    ttl_seconds=settings.cache_ttl_seconds,
+)
 
-app = FastAPI(title="Sentiment Analyzer")
-clf = pipeline("sentiment-analysis", model="cardiffnlp/twitter-roberta-base-sentiment")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load in the background so the process answers liveness probes while
+    # the model downloads; readiness flips once warm-up has finished.
+    loading = asyncio.create_task(model.load())
+    batcher.start()
+    try:
+        yield
+    finally:
+        loading.cancel()
+        await batcher.stop()
+        await cache.close()
+
+
+app = FastAPI(title="Sentiment Analyzer", lifespan=lifespan)
 
 
 class TextIn(BaseModel):
     texts: list[str]
 
 
+@app.get("/healthz", response_model=HealthResponse)
+def healthz() -> HealthResponse:
+    return HealthResponse(service="sentiment-analyzer")
+
+
+@app.get("/readyz", response_model=HealthResponse)
+def readyz() -> HealthResponse:
+    details = {"model": model_id(settings.model_name, settings.backend, settings.onnx_quantize)}
+    details.update(model.status())
+    if not model.ready:
+        raise HTTPException(status_code=503, detail=details)
+    return HealthResponse(service="sentiment-analyzer", details=details)
+
+
 @app.post("/analyze")
-def analyze(payload: TextIn):
-    out = clf(payload.texts)
+async def analyze(payload: TextIn):
+    out = await cache.get_many(payload.texts)
+    # Only unique cache misses go to the model.
+    missing = list(dict.fromkeys(text for text, hit in zip(payload.texts, out) if hit is None))
+    if missing:
+        if not model.ready:
+            raise HTTPException(status_code=503, detail="Model is still loading")
+        fresh = dict(zip(missing, await batcher.submit(missing)))
+        await cache.set_many(fresh)
+        out = [fresh[text] if hit is None else hit for text, hit in zip(payload.texts, out)]
     return {"results": out}
+
+
+@app.get("/cache/stats")
+def cache_stats() -> dict:
+    return cache.stats()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import resource
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class ModelNotReady(RuntimeError):
+    pass
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in KiB on Linux, which is what the images run.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ModelHandle:
+    """Loads the pipeline in the background and tracks readiness.
+
+    The handle is callable with a list of texts once loaded, so it can be
+    passed straight to the batcher; before that it raises ``ModelNotReady``.
+    """
+
+    def __init__(self, loader: Callable[[], Any], warmup_texts: list[str] | None = None):
+        self.loader = loader
+        self.warmup_texts = warmup_texts or []
+        self.pipeline: Any = None
+        self.error: str | None = None
+        self.load_seconds: float | None = None
+        self.warmup_seconds: float | None = None
+        self.memory_mb: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.pipeline is not None
+
+    async def load(self) -> None:
+        try:
+            rss_before = _peak_rss_mb()
+            started = time.perf_counter()
+            pipe = await asyncio.to_thread(self.loader)
+            loaded = time.perf_counter()
+            self.load_seconds = round(loaded - started, 3)
+
+            if self.warmup_texts:
+                await asyncio.to_thread(pipe, self.warmup_texts, batch_size=len(self.warmup_texts))
+                self.warmup_seconds = round(time.perf_counter() - loaded, 3)
+
+            self.memory_mb = round(_peak_rss_mb() - rss_before, 1)
+            self.pipeline = pipe
+            logger.info(
+                "Model ready in %.1fs (warm-up %.1fs, +%.0f MiB)",
+                self.load_seconds,
+                self.warmup_seconds or 0.0,
+                self.memory_mb,
+            )
+        except Exception as exc:
+            logger.exception("Model failed to load")
+            self.error = repr(exc)
+
+    def __call__(self, texts: list[str]) -> list[Any]:
+        if self.pipeline is None:
+            raise ModelNotReady("model is still loading")
+        return self.pipeline(texts, batch_size=len(texts))
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "model_memory_mb": self.memory_mb,
+        }
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import hdbscan
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.random_projection import SparseRandomProjection
+
+logger = logging.getLogger(__name__)
+
+REDUCTIONS = ("none", "svd", "random")
+
+
+def make_reducer(method: str, n_components: int, n_features: int):
+    """Unfitted projection to ``n_components`` dims, or None to keep raw TF-IDF."""
+    if method == "none":
+        return None
+    n_components = min(n_components, n_features - 1)
+    if n_components < 2:
+        return None
+    if method == "svd":
+        return TruncatedSVD(n_components=n_components, random_state=0)
+    if method == "random":
+        return SparseRandomProjection(n_components=n_components, dense_output=True, random_state=0)
+    raise ValueError(f"Unknown reduction {method!r}, expected one of {REDUCTIONS}")
+
+
+def embed(X, reducer, fit: bool = False):
+    """Project TF-IDF rows and L2-normalise them, so euclidean HDBSCAN ranks like cosine."""
+    if reducer is None:
+        return X
+    Z = reducer.fit_transform(X) if fit else reducer.transform(X)
+    return normalize(Z).astype(np.float32, copy=False)
+
+
+def cluster_top_terms(X, labels, terms, k: int = 8) -> dict[int, list[str]]:
+    """Top ``k`` TF-IDF terms of each cluster centroid, skipping noise.
+
+    All cluster sums come from one sparse ``indicator @ X`` product, and
+    each row is ranked with ``argpartition`` over its non-zero weights only.
+    Dividing by cluster size would not change the ranking, so it is skipped.
+    Clusters with fewer than ``k`` non-zero terms return only those terms.
+    """
+    labels = np.asarray(labels)
+    member = labels != -1  # Skip noise points
+    cluster_ids, inverse = np.unique(labels[member], return_inverse=True)
+    if cluster_ids.size == 0:
+        return {}
+
+    rows = np.flatnonzero(member)
+    indicator = sp.csr_matrix(
+        (np.ones(rows.size, dtype=X.dtype), (inverse, rows)),
+        shape=(cluster_ids.size, X.shape[0]),
+    )
+    sums = sp.csr_matrix(indicator @ X)
+
+    out: dict[int, list[str]] = {}
+    for row, cluster_id in enumerate(cluster_ids.tolist()):
+        start, end = sums.indptr[row], sums.indptr[row + 1]
+        weights = sums.data[start:end]
+        columns = sums.indices[start:end]
+        if weights.size > k:
+            top = np.argpartition(weights, -k)[-k:]
+        else:
+            top = np.arange(weights.size)
+        top = top[np.argsort(weights[top])[::-1]]
+        out[cluster_id] = [terms[i] for i in columns[top]]
+    return out
+
+
+class IncrementalClusterer:
+    """Keeps a fitted vocabulary and HDBSCAN model between calls.
+
+    New documents are vectorised with the stored vocabulary/IDF, projected
+    with the stored reducer and assigned with ``hdbscan.approximate_predict``.
+    The model is refitted on the retained corpus only when it is older than
+    ``refit_interval_s`` or when the share of new documents landing in noise
+    exceeds ``drift_threshold``.
+    """
+
+    def __init__(
+        self,
+        min_cluster_size: int = 2,
+        max_features: int = 50_000,
+        dense_max_features: int = 4096,
+        reduction: str = "svd",
+        n_components: int = 200,
+        max_docs: int = 20_000,
+        refit_interval_s: float = 7 * 24 * 3600,
+        drift_threshold: float = 0.5,
+        min_docs_for_drift: int = 50,
+        state_path: str | None = None,
+    ):
+        self.min_cluster_size = min_cluster_size
+        self.max_features = max_features
+        self.dense_max_features = dense_max_features
+        self.reduction = reduction
+        self.n_components = n_components
+        self.refit_interval_s = refit_interval_s
+        self.drift_threshold = drift_threshold
+        self.min_docs_for_drift = min_docs_for_drift
+        self.state_path = state_path
+        self.lock = threading.Lock()
+
+        self.corpus: deque[str] = deque(maxlen=max_docs)
+        self.vectorizer: TfidfVectorizer | None = None
+        self.reducer = None
+        self.clusterer: hdbscan.HDBSCAN | None = None
+        self.top_terms: dict[int, list[str]] = {}
+        self.fitted_at: float | None = None
+        self.fit_docs = 0
+        self.assigned_since_fit = 0
+        self.noise_since_fit = 0
+        self._load()
+
+    @property
+    def drift(self) -> float:
+        return self.noise_since_fit / max(1, self.assigned_since_fit)
+
+    def refit_reason(self) -> str | None:
+        if self.clusterer is None:
+            return "unfitted"
+        if time.time() - self.fitted_at >= self.refit_interval_s:
+            return "schedule"
+        if self.assigned_since_fit >= self.min_docs_for_drift and self.drift > self.drift_threshold:
+            return "drift"
+        return None
+
+    def assign(self, texts: list[str]) -> list[int]:
+        """Cluster label per text (-1 for noise).
+
+        Texts already in the corpus are not added again. Until the corpus has
+        enough shared terms for a first fit, every text is labelled -1.
+        """
+        if not texts:
+            return []
+        if len(dict.fromkeys(texts)) > self.corpus.maxlen:
+            raise ValueError(f"At most {self.corpus.maxlen} distinct texts per call")
+        with self.lock:
+            known = set(self.corpus)
+            self.corpus.extend(text for text in dict.fromkeys(texts) if text not in known)
+            reason = self.refit_reason()
+            if reason is not None:
+                try:
+                    labels = self._refit(reason)
+                except ValueError as exc:
+                    # TfidfVectorizer: too few documents share a term yet.
+                    logger.info("Trend model refit (%s) skipped: %s", reason, exc)
+                    if self.clusterer is None:
+                        return [-1] * len(texts)
+                else:
+                    return self._labels_after_refit(texts, labels)
+
+            X = self.vectorizer.transform(texts)
+            labels, _ = hdbscan.approximate_predict(self.clusterer, self._features(X))
+            self.assigned_since_fit += len(texts)
+            self.noise_since_fit += int(np.sum(labels == -1))
+            return labels.tolist()
+
+    def _labels_after_refit(self, texts: list[str], labels: np.ndarray) -> list[int]:
+        # Texts in the refitted corpus take their fit labels. A text that was
+        # already known may have been evicted by this call's additions; it is
+        # predicted against the new model like any unseen text.
+        by_text = dict(zip(self.corpus, labels.tolist()))
+        evicted = [text for text in dict.fromkeys(texts) if text not in by_text]
+        if evicted:
+            predicted, _ = hdbscan.approximate_predict(
+                self.clusterer, self._features(self.vectorizer.transform(evicted))
+            )
+            by_text.update(zip(evicted, predicted.tolist()))
+        return [by_text[text] for text in texts]
+
+    def refit(self) -> None:
+        with self.lock:
+            self._refit("manual")
+
+    def _refit(self, reason: str) -> np.ndarray:
+        started = time.perf_counter()
+        texts = list(self.corpus)
+        max_features = self.max_features
+        if self.reduction == "none":
+            # Unprojected rows are densified for HDBSCAN: docs x features floats.
+            max_features = min(max_features, self.dense_max_features)
+        vectorizer = TfidfVectorizer(
+            max_df=0.9,
+            min_df=2,
+            ngram_range=(1, 2),
+            max_features=max_features,
+            dtype=np.float32,
+        )
+        X = vectorizer.fit_transform(texts)
+        reducer = make_reducer(self.reduction, self.n_components, X.shape[1])
+        Z = embed(X, reducer, fit=True)
+        clusterer = hdbscan.HDBSCAN(min_cluster_size=self.min_cluster_size, prediction_data=True)
+        clusterer.fit(Z if reducer is not None else X.toarray())
+
+        self.vectorizer = vectorizer
+        self.reducer = reducer
+        self.clusterer = clusterer
+        self.top_terms = cluster_top_terms(X, clusterer.labels_, vectorizer.get_feature_names_out())
+        self.fitted_at = time.time()
+        self.fit_docs = len(texts)
+        self.assigned_since_fit = 0
+        self.noise_since_fit = 0
+        logger.info(
+            "Refitted trend model on %d docs (%s) in %.2fs",
+            len(texts),
+            reason,
+            time.perf_counter() - started,
+        )
+        self._save()
+        return clusterer.labels_
+
+    def _features(self, X):
+        # approximate_predict needs dense input; without a reducer that means
+        # densifying the (capped) vocabulary.
+        if self.reducer is None:
+            return X.toarray()
+        return embed(X, self.reducer)
+
+    def status(self) -> dict:
+        return {
+            "fitted": self.clusterer is not None,
+            "fitted_at": self.fitted_at,
+            "fit_docs": self.fit_docs,
+            "corpus_docs": len(self.corpus),
+            "assigned_since_fit": self.assigned_since_fit,
+            "drift": round(self.drift, 4),
+            "clusters": len(self.top_terms),
+        }
+
+    def _save(self) -> None:
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        joblib.dump(
+            {
+                "corpus": list(self.corpus),
+                "vectorizer": self.vectorizer,
+                "reducer": self.reducer,
+                "clusterer": self.clusterer,
+                "top_terms": self.top_terms,
+                "fitted_at": self.fitted_at,
+                "fit_docs": self.fit_docs,
+            },
+            tmp_path,
+        )
+        os.replace(tmp_path, self.state_path)
+
+    def _load(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            state = joblib.load(self.state_path)
+        except Exception as exc:
+            logger.warning("Ignoring unreadable trend state %s: %s", self.state_path, exc)
+            return
+        self.corpus.extend(state["corpus"])
+        self.vectorizer = state["vectorizer"]
+        self.reducer = state.get("reducer")
+        self.clusterer = state["clusterer"]
+        self.top_terms = state["top_terms"]
+        self.fitted_at = state["fitted_at"]
+        self.fit_docs = state["fit_docs"]
@@ -1,50 +1,110 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+from typing import Literal
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+from pydantic_settings import BaseSettings
 from sklearn.feature_extraction.text import TfidfVectorizer
 import hdbscan
-import numpy as np
 
+from .clustering import IncrementalClusterer, cluster_top_terms, embed, make_reducer
+
+
+class Settings(BaseSettings):
+    reduction: str = "svd"
+    n_components: int = 200
+
+    incremental_max_features: int = 50_000
+    # With reduction="none" the incremental model clusters dense TF-IDF rows,
+    # so its vocabulary is capped much lower.
+    incremental_dense_max_features: int = 4096
+    incremental_max_docs: int = 20_000
+    refit_interval_s: float = 7 * 24 * 3600
+    refit_drift_threshold: float = 0.5
+    refit_min_docs: int = 50
+    state_path: str | None = None
+
+
+settings = Settings()
 app = FastAPI(title="Trend Detector")
+incremental = IncrementalClusterer(
+    max_features=settings.incremental_max_features,
+    dense_max_features=settings.incremental_dense_max_features,
+    reduction=settings.reduction,
+    n_components=settings.n_components,
+    max_docs=settings.incremental_max_docs,
+    refit_interval_s=settings.refit_interval_s,
+    drift_threshold=settings.refit_drift_threshold,
+    min_docs_for_drift=settings.refit_min_docs,
+    state_path=settings.state_path,
+)
 
 
 class Docs(BaseModel):
     texts: list[str]
+    # Assign texts against the persisted model instead of refitting from scratch.
+    incremental: bool = False
+    # Projection applied before HDBSCAN; defaults come from the service settings.
+    reduction: Literal["none", "svd", "random"] | None = None
+    n_components: int | None = Field(default=None, ge=2, le=2048)
+    # HDBSCAN core-distance algorithm ("best" picks a tree for dense input).
+    # Ignored (generic is used) when no projection applies, e.g. with
+    # reduction="none" or a vocabulary too small to project.
+    algorithm: Literal[
+        "best", "generic", "prims_kdtree", "prims_balltree", "boruvka_kdtree", "boruvka_balltree"
+    ] = "best"
 
 
 @app.post("/clusters")
 def clusters(data: Docs):
+    if data.incremental:
+        try:
+            labels = incremental.assign(data.texts)
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=str(exc)) from exc
+        clusters_out = [
+            {"cluster": cluster_id, "top_terms": incremental.top_terms.get(cluster_id, [])}
+            for cluster_id in sorted(set(labels))
+            if cluster_id != -1
+        ]
+        return {"labels": labels, "clusters": clusters_out, "model": incremental.status()}
+
     vec = TfidfVectorizer(max_df=0.9, min_df=2, ngram_range=(1, 2))
     X = vec.fit_transform(data.texts)
-    
-    clusterer = hdbscan.HDBSCAN(min_cluster_size=2, gen_min_span_tree=True)
-    clusterer.fit(X)
-    
+
+    reducer = make_reducer(
+        data.reduction or settings.reduction,
+        data.n_components or settings.n_components,
+        X.shape[1],
+    )
+    # Without a projection HDBSCAN gets the sparse TF-IDF matrix, which only
+    # the generic (precomputed distance) algorithm accepts.
+    algorithm = data.algorithm if reducer is not None else "generic"
+    clusterer = hdbscan.HDBSCAN(min_cluster_size=2, algorithm=algorithm)
+    clusterer.fit(embed(X, reducer, fit=True))
+
     labels = clusterer.labels_.tolist()
-    
+
     # To get top terms, we need to calculate cluster centroids manually
     # HDBSCAN does not provide centroids directly
-    
-    unique_labels = set(labels)
-    clusters_out = []
-    terms = vec.get_feature_names_out()
-
-    for cluster_id in unique_labels:
-        if cluster_id == -1:  # Skip noise points
-            continue
-        
-        # Get all points in the current cluster
-        indices = [i for i, label in enumerate(labels) if label == cluster_id]
-        cluster_points = X[indices]
-        
-        # Calculate the centroid of the cluster
-        centroid = np.mean(cluster_points, axis=0)
-        
-        # Get top terms from the centroid
-        # The centroid is a dense vector, so we need to convert it to an array
-        centroid_array = centroid.A.flatten()
-        top_terms_indices = centroid_array.argsort()[-8:][::-1]
-        top_terms = [terms[i] for i in top_terms_indices]
-        
-        clusters_out.append({"cluster": cluster_id, "top_terms": top_terms})
+    top_terms = cluster_top_terms(X, labels, vec.get_feature_names_out())
+    clusters_out = [
+        {"cluster": cluster_id, "top_terms": terms} for cluster_id, terms in top_terms.items()
+    ]
 
     return {"labels": labels, "clusters": clusters_out}
+
+
+@app.post("/clusters/refit")
+def refit():
+    if not incremental.corpus:
+        raise HTTPException(status_code=409, detail="No documents to fit yet")
+    try:
+        incremental.refit()
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=f"Not enough documents to fit yet: {exc}") from exc
+    return incremental.status()
+
+
+@app.get("/clusters/model")
+def model_status():
+    return incremental.status()
@@ -5,17 +5,38 @@ from functools import lru_cache
 from typing import Optional
 
 import httpx
+from fastapi import Request
 from pydantic_settings import BaseSettings
+from sqlalchemy.engine import Engine
+
+from common.ratelimit import PRIORITY_INTERACTIVE, get_bucket, send_async
+from common.rollups import create_rollup_engine
+from common.upstream import UpstreamSettings
 
 logger = logging.getLogger(__name__)
 
 
-class Settings(BaseSettings):
+class Settings(UpstreamSettings, BaseSettings):
     META_PAGE_ID: str
     META_APP_ID: str
     META_APP_SECRET: str
     META_LONG_LIVED_TOKEN: str
 
+    # Token bucket per access token; rate-limit headers tighten it further.
+    RATE_LIMIT_PER_SECOND: float = 1.0
+    RATE_LIMIT_BURST: int = 20
+    RATE_LIMIT_RETRIES: int = 3
+    # Longest a request waits on the limiter before answering 429.
+    RATE_LIMIT_MAX_WAIT: float = 10.0
+
+    # /metrics/hashtag/batch: the Graph API has no multi-hashtag call, so tags
+    # are fetched one by one with this many in flight.
+    HASHTAG_BATCH_CONCURRENCY: int = 8
+    HASHTAG_BATCH_MAX: int = 200
+
+    # Postgres URL for daily hashtag rollups; unset disables them.
+    DATABASE_URL: Optional[str] = None
+
     class Config:
         env_file = ".env"
 
@@ -25,29 +46,51 @@ def get_settings() -> Settings:
     return Settings()
 
 
+@lru_cache(maxsize=1)
+def get_rollup_engine() -> Optional[Engine]:
+    return create_rollup_engine(get_settings().DATABASE_URL)
+
+
 class FacebookClient:
-    def __init__(self, settings: Settings | None = None):
+    def __init__(self, http: httpx.AsyncClient, settings: Settings | None = None):
+        self.http = http
         self.settings = settings or get_settings()
         self.base = "https://graph.facebook.com/v18.0"
         self.token = self.settings.META_LONG_LIVED_TOKEN
         self.page_id = self.settings.META_PAGE_ID
+        self.priority = PRIORITY_INTERACTIVE
+        self.bucket = get_bucket(
+            "facebook",
+            self.token,
+            self.settings.RATE_LIMIT_PER_SECOND,
+            self.settings.RATE_LIMIT_BURST,
+        )
 
     @staticmethod
-    def dep() -> "FacebookClient":
-        return FacebookClient()
+    def dep(request: Request) -> "FacebookClient":
+        return FacebookClient(request.app.state.http)
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return await send_async(
+            self.bucket,
+            lambda: self.http.request(method, url, **kwargs),
+            priority=self.priority,
+            max_retries=self.settings.RATE_LIMIT_RETRIES,
+            max_wait=self.settings.RATE_LIMIT_MAX_WAIT,
+        )
 
-    def fetch_page_insights(self) -> dict:
+    async def fetch_page_insights(self) -> dict:
         fields = "followers_count,fan_count,new_like_count,talking_about_count"
         url = f"{self.base}/{self.page_id}?fields={fields}&access_token={self.token}"
         try:
-            response = httpx.get(url, timeout=30)
+            response = await self._request("GET", url)
             response.raise_for_status()
             return response.json()
         except httpx.HTTPError as exc:
             logger.warning("Facebook page insights failed: %s", exc)
             return {}
 
-    def fetch_hashtag_insights(self, tag: str) -> Optional[dict]:
+    async def fetch_hashtag_insights(self, tag: str) -> Optional[dict]:
         search_url = f"{self.base}/ig_hashtag_search"
         params = {
             "user_id": self.page_id,
@@ -55,7 +98,7 @@ class FacebookClient:
             "access_token": self.token,
         }
         try:
-            response = httpx.get(search_url, params=params, timeout=30)
+            response = await self._request("GET", search_url, params=params)
             response.raise_for_status()
             data = response.json().get("data", [])
             if not data:
@@ -72,7 +115,7 @@ class FacebookClient:
             "access_token": self.token,
         }
         try:
-            response = httpx.get(media_url, params=params, timeout=30)
+            response = await self._request("GET", media_url, params=params)
             response.raise_for_status()
             top_media = response.json().get("data", [])
         except httpx.HTTPError as exc:
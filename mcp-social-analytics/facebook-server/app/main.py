@@ -1,16 +1,47 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from typing import Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 
-from common import HashtagInsights, HealthResponse, MediaItem
+from common import (
+    EngagementPoint,
+    HashtagBatchRequest,
+    HashtagBatchResponse,
+    HashtagInsights,
+    HealthResponse,
+    MediaItem,
+)
+from common.hashtags import batch_tags
+from common.ratelimit import install_rate_limit_handler
+from common.rollups import hashtag_series, normalize_tag, record_hashtag_safely
+from common.upstream import build_cache, build_http_client
 
-from .deps import FacebookClient
+from .deps import FacebookClient, get_rollup_engine, get_settings
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Facebook Analytics")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client per process so TLS sessions and keep-alive
+    # connections to the platform API are reused across requests.
+    app.state.http = build_http_client(get_settings())
+    app.state.cache = build_cache("facebook", get_settings())
+    try:
+        yield
+    finally:
+        await app.state.cache.close()
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="Facebook Analytics", lifespan=lifespan)
+
+install_rate_limit_handler(app)
 
 
 @app.get("/healthz", response_model=HealthResponse)
@@ -18,20 +49,17 @@ def healthz() -> HealthResponse:
     return HealthResponse(service="facebook-server")
 
 
-@app.get("/metrics/page")
-def page_metrics(client: FacebookClient = Depends(FacebookClient.dep)) -> dict:
-    return client.fetch_page_insights()
+@app.get("/cache/stats")
+async def cache_stats(request: Request) -> dict:
+    return request.app.state.cache.stats()
 
 
-@app.get("/metrics/hashtag", response_model=HashtagInsights)
-def hashtag_metrics(
-    tag: str = Query(..., min_length=1),
-    client: FacebookClient = Depends(FacebookClient.dep),
-) -> HashtagInsights:
-    data = client.fetch_hashtag_insights(tag)
-    if not data:
-        raise HTTPException(status_code=404, detail="No hashtag insights available")
+@app.get("/metrics/page")
+async def page_metrics(client: FacebookClient = Depends(FacebookClient.dep)) -> dict:
+    return await client.fetch_page_insights()
+
 
+def _hashtag_insights(tag: str, data: dict) -> HashtagInsights:
     top_posts = [
         MediaItem(
             id=str(item.get("id")),
@@ -51,3 +79,71 @@ def hashtag_metrics(
         avg_engagement_rate=data.get("avg_engagement_rate"),
         top_posts=top_posts,
     )
+
+
+async def _cached_hashtag(request: Request, client: FacebookClient, tag: str) -> Optional[dict]:
+    async def fetch() -> Optional[dict]:
+        data = await client.fetch_hashtag_insights(tag)
+        if data:
+            # Only upstream reads are recorded; cache hits carry no new snapshot.
+            await run_in_threadpool(
+                record_hashtag_safely, get_rollup_engine(), "facebook", _hashtag_insights(tag, data)
+            )
+        return data
+
+    return await request.app.state.cache.get_or_fetch("metrics/hashtag", {"tag": normalize_tag(tag)}, fetch)
+
+
+@app.get("/metrics/hashtag", response_model=HashtagInsights)
+async def hashtag_metrics(
+    request: Request,
+    tag: str = Query(..., min_length=1),
+    client: FacebookClient = Depends(FacebookClient.dep),
+) -> HashtagInsights:
+    data = await _cached_hashtag(request, client, tag)
+    if not data:
+        raise HTTPException(status_code=404, detail="No hashtag insights available")
+    return _hashtag_insights(tag, data)
+
+
+@app.post("/metrics/hashtag/batch", response_model=HashtagBatchResponse)
+async def hashtag_batch(
+    req: HashtagBatchRequest,
+    request: Request,
+    client: FacebookClient = Depends(FacebookClient.dep),
+) -> HashtagBatchResponse:
+    """Insights for many tags, fetched one by one through the cache.
+
+    The Graph API has no multi-hashtag call, so HASHTAG_BATCH_CONCURRENCY
+    tags are fetched at a time instead.
+    """
+    settings = client.settings
+    tags = batch_tags(req.tags, settings.HASHTAG_BATCH_MAX)
+    slots = asyncio.Semaphore(settings.HASHTAG_BATCH_CONCURRENCY)
+
+    async def one(tag: str) -> Optional[dict]:
+        async with slots:
+            return await _cached_hashtag(request, client, tag)
+
+    results = await asyncio.gather(*(one(tag) for tag in tags), return_exceptions=True)
+    response = HashtagBatchResponse()
+    for tag, result in zip(tags, results):
+        if isinstance(result, BaseException):
+            response.errors[tag] = str(result)
+        elif result:
+            response.items.append(_hashtag_insights(tag, result))
+        else:
+            response.missing.append(tag)
+    return response
+
+
+@app.get("/metrics/hashtag/history", response_model=list[EngagementPoint])
+def hashtag_history(
+    tag: str = Query(..., min_length=1),
+    days: int = Query(90, ge=1, le=3660),
+) -> list[EngagementPoint]:
+    engine = get_rollup_engine()
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Rollups are not configured")
+    with engine.connect() as conn:
+        return hashtag_series(conn, "facebook", tag, days)
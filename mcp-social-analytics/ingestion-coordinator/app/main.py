@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable
+
+import httpx
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic_settings import BaseSettings
+
+from common import HealthResponse, MediaItem
+
+logger = logging.getLogger(__name__)
+
+
+class Settings(BaseSettings):
+    instagram_server_url: str = "http://instagram-server:8000"
+    tiktok_server_url: str = "http://tiktok-server:8000"
+    facebook_server_url: str = "http://facebook-server:8000"
+    twitter_server_url: str = "http://twitter-server:8000"
+
+    enabled_platforms: list[str] = ["instagram", "tiktok", "facebook", "twitter"]
+    default_timeout: float = 15.0
+    # Per-platform overrides, e.g. PLATFORM_TIMEOUTS='{"instagram": 30}'.
+    platform_timeouts: dict[str, float] = {}
+
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+
+
+settings = Settings()
+
+
+@dataclass(frozen=True)
+class Source:
+    platform: str
+    base_url: str
+    recent_path: str | None
+    recent_param: str | None
+
+    @property
+    def timeout(self) -> float:
+        return settings.platform_timeouts.get(self.platform, settings.default_timeout)
+
+
+SOURCES = {
+    source.platform: source
+    for source in (
+        # Instagram serves stored media; ingestion runs on its own schedule.
+        Source("instagram", settings.instagram_server_url, "/media", "limit"),
+        Source("tiktok", settings.tiktok_server_url, "/videos/recent", "count"),
+        Source("facebook", settings.facebook_server_url, None, None),
+        Source("twitter", settings.twitter_server_url, None, None),
+    )
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+    )
+    app.state.http = httpx.AsyncClient(limits=limits)
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="Ingestion Coordinator", lifespan=lifespan)
+
+Extract = Callable[[dict], list[dict]]
+Call = tuple[Source, str, dict, Extract]
+
+
+def _items(payload: dict) -> list[dict]:
+    return payload.get("items", [])
+
+
+def _top_posts(payload: dict) -> list[dict]:
+    return payload.get("top_posts", [])
+
+
+async def _fetch(client: httpx.AsyncClient, call: Call) -> tuple[str, list[MediaItem], dict]:
+    source, path, params, extract = call
+    started = time.perf_counter()
+    status: dict = {"status": "ok"}
+    items: list[MediaItem] = []
+    try:
+        response = await asyncio.wait_for(
+            client.get(f"{source.base_url}{path}", params=params, timeout=source.timeout),
+            source.timeout,
+        )
+        if response.status_code == 404:
+            status = {"status": "empty"}
+        else:
+            response.raise_for_status()
+            items = [
+                MediaItem.model_validate({**item, "platform": source.platform})
+                for item in extract(response.json())
+            ]
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        status = {"status": "timeout"}
+    except (httpx.HTTPError, ValueError) as exc:
+        logger.warning("%s fetch failed: %s", source.platform, exc)
+        status = {"status": "error", "error": str(exc)}
+    status.update(count=len(items), elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+    return source.platform, items, status
+
+
+async def fan_out(client: httpx.AsyncClient, calls: list[Call]) -> AsyncIterator[dict]:
+    """Yield items platform by platform as each finishes, then a summary record.
+
+    A slow or failing platform only affects its own entry in the summary;
+    everything else has already been streamed by the time it resolves.
+    """
+    tasks = [asyncio.create_task(_fetch(client, call)) for call in calls]
+    summary: dict[str, dict] = {}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            platform, items, status = await next_done
+            summary[platform] = status
+            for item in items:
+                yield {"type": "item", "item": item.model_dump(mode="json")}
+    finally:
+        for task in tasks:
+            task.cancel()
+    yield {"type": "summary", "platforms": summary}
+
+
+def _platforms(requested: list[str] | None) -> list[Source]:
+    names = requested or settings.enabled_platforms
+    unknown = [name for name in names if name not in SOURCES]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown platforms: {unknown}")
+    return [SOURCES[name] for name in names if name in settings.enabled_platforms]
+
+
+def _ndjson(records: AsyncIterator[dict]) -> StreamingResponse:
+    async def lines():
+        async for record in records:
+            yield json.dumps(record) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/healthz", response_model=HealthResponse)
+def healthz() -> HealthResponse:
+    return HealthResponse(
+        service="ingestion-coordinator",
+        details={"enabled_platforms": settings.enabled_platforms},
+    )
+
+
+@app.get("/media/recent")
+async def recent_media(
+    request: Request,
+    # Instagram's /media caps limit at 1000; more would turn that source into a 422.
+    limit: int = Query(50, ge=1, le=1000),
+    platforms: list[str] | None = Query(None),
+) -> StreamingResponse:
+    calls: list[Call] = [
+        (source, source.recent_path, {source.recent_param: limit}, _items)
+        for source in _platforms(platforms)
+        if source.recent_path
+    ]
+    return _ndjson(fan_out(request.app.state.http, calls))
+
+
+@app.get("/media/hashtag")
+async def hashtag_media(
+    request: Request,
+    tag: str = Query(..., min_length=1),
+    platforms: list[str] | None = Query(None),
+) -> StreamingResponse:
+    calls: list[Call] = [
+        (source, "/metrics/hashtag", {"tag": tag}, _top_posts) for source in _platforms(platforms)
+    ]
+    return _ndjson(fan_out(request.app.state.http, calls))
@@ -1,18 +1,28 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import threading
+import time
 from functools import lru_cache
-from typing import Generator, Optional
+from typing import Generator, Iterator, Optional
 
 import httpx
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic_settings import BaseSettings
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
+from common.ratelimit import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, get_bucket, send, send_async
+from common.upstream import UpstreamSettings, build_sync_http_client
+
 logger = logging.getLogger(__name__)
 
+MEDIA_FIELDS = "id,caption,media_type,media_url,timestamp,like_count,comments_count"
+
 
-class Settings(BaseSettings):
+class Settings(UpstreamSettings, BaseSettings):
     META_APP_ID: str
     META_APP_SECRET: str
     META_LONG_LIVED_TOKEN: str
@@ -24,6 +34,25 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "mitchpass"
     POSTGRES_DB: str = "mitch_ai"
 
+    # Token bucket per access token; usage headers tighten it further.
+    RATE_LIMIT_PER_SECOND: float = 1.0
+    RATE_LIMIT_BURST: int = 20
+    RATE_LIMIT_RETRIES: int = 3
+    # Longest a caller waits on the limiter: requests answer 429 quickly, the
+    # scheduled sync can sit out a whole usage window.
+    RATE_LIMIT_MAX_WAIT: float = 10.0
+    RATE_LIMIT_BACKGROUND_MAX_WAIT: float = 900.0
+
+    # /metrics/hashtag/batch: the Graph API has no multi-hashtag call, so tags
+    # are fetched one by one with this many in flight. Hashtag search is
+    # capped at 30 unique tags per 7 days; resolved IDs are cached.
+    HASHTAG_BATCH_CONCURRENCY: int = 4
+    HASHTAG_BATCH_MAX: int = 200
+
+    HASHTAG_ID_TTL_SECONDS: int = 30 * 24 * 3600
+    # Background /ingest/sync cadence; 0 leaves ingestion to external callers.
+    SYNC_INTERVAL_SECONDS: int = 900
+
     class Config:
         env_file = ".env"
 
@@ -45,41 +74,144 @@ engine = create_engine(settings.database_url, future=True, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
+# Ingestion jobs run in worker threads and share this pooled sync client;
+# request handlers use the app-scoped async client built in the lifespan.
+http = build_sync_http_client(settings)
+
+
+class HashtagIdCache:
+    """TTL cache for hashtag name -> Graph API ID, backed by Postgres.
+
+    Hashtag search is limited to 30 unique tags per 7 days, so resolved IDs
+    are kept in memory and in ``instagram_hashtag_ids`` to survive restarts.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._memory: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tag: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(tag)
+        if cached and cached[1] > now:
+            return cached[0]
+
+        try:
+            with SessionLocal() as db:
+                row = db.execute(
+                    text(
+                        "SELECT hashtag_id, EXTRACT(EPOCH FROM resolved_at) FROM instagram_hashtag_ids"
+                        " WHERE hashtag = :tag"
+                    ),
+                    {"tag": tag},
+                ).first()
+        except Exception as exc:
+            logger.warning("Hashtag ID lookup failed for '%s': %s", tag, exc)
+            return None
+        if row is None or float(row[1]) + self.ttl_seconds <= now:
+            return None
+        with self._lock:
+            self._memory[tag] = (row[0], float(row[1]) + self.ttl_seconds)
+        return row[0]
+
+    def set(self, tag: str, hashtag_id: str) -> None:
+        with self._lock:
+            self._memory[tag] = (hashtag_id, time.time() + self.ttl_seconds)
+        try:
+            with SessionLocal() as db:
+                db.execute(
+                    text(
+                        "INSERT INTO instagram_hashtag_ids (hashtag, hashtag_id, resolved_at)"
+                        " VALUES (:tag, :hashtag_id, NOW())"
+                        " ON CONFLICT (hashtag) DO UPDATE"
+                        " SET hashtag_id = EXCLUDED.hashtag_id, resolved_at = EXCLUDED.resolved_at"
+                    ),
+                    {"tag": tag, "hashtag_id": hashtag_id},
+                )
+                db.commit()
+        except Exception as exc:
+            logger.warning("Failed to persist hashtag ID for '%s': %s", tag, exc)
+
+
+hashtag_ids = HashtagIdCache(settings.HASHTAG_ID_TTL_SECONDS)
+
 
 class MetaClient:
-    def __init__(self):
+    def __init__(
+        self,
+        priority: int = PRIORITY_INTERACTIVE,
+        async_http: Optional[httpx.AsyncClient] = None,
+        max_wait: Optional[float] = None,
+    ):
         cfg = settings
         self.base = "https://graph.facebook.com/v18.0"
         self.token = cfg.META_LONG_LIVED_TOKEN
         self.ig_id = cfg.META_IG_BUSINESS_ID
+        self.http = http
+        self.async_http = async_http
+        self.priority = priority
+        self.max_wait = cfg.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        self.bucket = get_bucket("instagram", self.token, cfg.RATE_LIMIT_PER_SECOND, cfg.RATE_LIMIT_BURST)
+
+    @staticmethod
+    def dep(request: Request) -> "MetaClient":
+        return MetaClient(async_http=request.app.state.http)
 
     @staticmethod
-    def dep() -> "MetaClient":
-        return MetaClient()
+    def background_dep() -> "MetaClient":
+        """Client for ingestion requests, queued behind interactive ones.
+
+        Still bounded by ``RATE_LIMIT_MAX_WAIT``: the caller holds a request
+        (and a threadpool worker) open while it waits.
+        """
+        return MetaClient(priority=PRIORITY_BACKGROUND)
+
+    def _get(self, url: str, **kwargs) -> httpx.Response:
+        return send(
+            self.bucket,
+            lambda: self.http.get(url, **kwargs),
+            priority=self.priority,
+            max_retries=settings.RATE_LIMIT_RETRIES,
+            max_wait=self.max_wait,
+        )
 
-    def exchange_code_for_token(self, code: str) -> Optional[str]:
+    async def _aget(self, url: str, **kwargs) -> httpx.Response:
+        return await send_async(
+            self.bucket,
+            lambda: self.async_http.get(url, **kwargs),
+            priority=self.priority,
+            max_retries=settings.RATE_LIMIT_RETRIES,
+            max_wait=self.max_wait,
+        )
+
+    async def exchange_code_for_token(self, code: str) -> Optional[str]:
         return None
 
-    def fetch_account_insights(self) -> dict:
+    async def fetch_account_insights(self) -> dict:
         url = (
             f"{self.base}/{self.ig_id}?fields=followers_count,media_count"
             f"&access_token={self.token}"
         )
         try:
-            response = httpx.get(url, timeout=30)
+            response = await self._aget(url)
             response.raise_for_status()
             return response.json()
         except httpx.HTTPError as exc:
             logger.warning("Failed to fetch account insights: %s", exc)
             return {}
 
-    def fetch_hashtag_insights(self, tag: str) -> Optional[dict]:
-        hashtag_id = self._resolve_hashtag_id(tag)
+    async def fetch_hashtag_insights(self, tag: str) -> Optional[dict]:
+        hashtag_id = await self._resolve_hashtag_id(tag)
         if not hashtag_id:
             return None
 
-        top_media = self._fetch_hashtag_media(hashtag_id, "top_media")
-        recent_media = self._fetch_hashtag_media(hashtag_id, "recent_media")
+        # Both edges only need the ID, so fetch them side by side.
+        top_media, recent_media = await asyncio.gather(
+            self._fetch_hashtag_media(hashtag_id, "top_media"),
+            self._fetch_hashtag_media(hashtag_id, "recent_media"),
+        )
 
         impressions = sum(item.get("like_count", 0) for item in top_media)
         reach = sum(item.get("comments_count", 0) for item in top_media)
@@ -97,12 +229,11 @@ class MetaClient:
 
     def fetch_recent_media(self, limit: int = 50) -> list[dict]:
         url = (
-            f"{self.base}/{self.ig_id}/media"
-            "?fields=id,caption,media_type,media_url,timestamp,like_count,comments_count"
+            f"{self.base}/{self.ig_id}/media?fields={MEDIA_FIELDS}"
             f"&limit={limit}&access_token={self.token}"
         )
         try:
-            response = httpx.get(url, timeout=30)
+            response = self._get(url)
             response.raise_for_status()
             payload = response.json()
             return payload.get("data", [])
@@ -110,31 +241,59 @@ class MetaClient:
             logger.warning("Failed to fetch recent media: %s", exc)
             return []
 
-    def _resolve_hashtag_id(self, tag: str) -> Optional[str]:
-        normalized = tag.lstrip("#")
+    def iter_media_pages(
+        self, page_size: int = 100, after: Optional[str] = None
+    ) -> Iterator[tuple[list[dict], Optional[str]]]:
+        """Yield ``(items, next_cursor)`` per page, following Graph API cursors.
+
+        ``next_cursor`` is None on the last page. HTTP errors propagate so the
+        caller can stop and keep its last committed cursor.
+        """
+        url = f"{self.base}/{self.ig_id}/media"
+        while True:
+            params = {"fields": MEDIA_FIELDS, "limit": page_size, "access_token": self.token}
+            if after:
+                params["after"] = after
+            response = self._get(url, params=params)
+            response.raise_for_status()
+            payload = response.json()
+            paging = payload.get("paging", {})
+            after = paging.get("cursors", {}).get("after") if paging.get("next") else None
+            yield payload.get("data", []), after
+            if not after:
+                return
+
+    async def _resolve_hashtag_id(self, tag: str) -> Optional[str]:
+        normalized = tag.lstrip("#").lower()
+        cached = await run_in_threadpool(hashtag_ids.get, normalized)
+        if cached:
+            return cached
+
         url = (
             f"{self.base}/ig_hashtag_search?user_id={self.ig_id}&q={normalized}"
             f"&access_token={self.token}"
         )
         try:
-            response = httpx.get(url, timeout=30)
+            response = await self._aget(url)
             response.raise_for_status()
             data = response.json().get("data", [])
             if not data:
                 return None
-            return str(data[0].get("id"))
+            hashtag_id = str(data[0].get("id"))
         except httpx.HTTPError as exc:
             logger.warning("Failed to resolve hashtag '%s': %s", tag, exc)
             return None
+        await run_in_threadpool(hashtag_ids.set, normalized, hashtag_id)
+        return hashtag_id
 
-    def _fetch_hashtag_media(self, hashtag_id: str, media_type: str) -> list[dict]:
+    async def _fetch_hashtag_media(self, hashtag_id: str, media_type: str) -> list[dict]:
         url = (
             f"{self.base}/{hashtag_id}/{media_type}?user_id={self.ig_id}"
             "&fields=id,caption,media_type,media_url,permalink,like_count,comments_count"
             f"&access_token={self.token}"
         )
         try:
-            response = httpx.get(url, timeout=30)
+            response = await self._aget(url)
             response.raise_for_status()
             return response.json().get("data", [])
         except httpx.HTTPError as exc:
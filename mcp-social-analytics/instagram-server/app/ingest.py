@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+import io
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator
+
+import httpx
+from sqlalchemy import literal_column, or_, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from common.ratelimit import PRIORITY_BACKGROUND, RateLimited
+from common.rollups import replace_hashtag_days, upsert_account_days
+
+from .deps import MetaClient, SessionLocal, engine, settings
+from .models import InstagramIngestCursor, InstagramMedia, InstagramSyncWatermark
+from .storage import conflict_columns, ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+MUTABLE_COLUMNS = ("caption", "media_type", "media_url", "timestamp", "like_count", "comments_count")
+
+
+def _storable(payloads: list[dict]) -> list[dict]:
+    # The timestamp is part of the partitioned primary key.
+    rows = [payload for payload in payloads if payload.get("timestamp") is not None]
+    if len(rows) < len(payloads):
+        logger.warning("Skipping %d media without a timestamp", len(payloads) - len(rows))
+    return rows
+
+
+def _day_params(payloads: list[dict]) -> dict | None:
+    days = sorted({payload["timestamp"].astimezone(timezone.utc).date() for payload in payloads})
+    if not days:
+        return None
+    return {
+        "start": datetime.combine(days[0], datetime.min.time(), timezone.utc),
+        "end": datetime.combine(days[-1] + timedelta(days=1), datetime.min.time(), timezone.utc),
+        "days": days,
+    }
+
+
+def refresh_rollups(db: Session, payloads: list[dict]) -> None:
+    """Recompute the account and hashtag rollups for the days these rows fall on."""
+    params = _day_params(payloads)
+    if params is None:
+        return
+    conn = db.connection()
+    upsert_account_days(
+        conn,
+        "instagram",
+        settings.META_IG_BUSINESS_ID,
+        "SELECT (timestamp AT TIME ZONE 'UTC')::date AS day, COUNT(*) AS posts,"
+        " COALESCE(SUM(like_count), 0) AS likes, COALESCE(SUM(comments_count), 0) AS comments"
+        " FROM instagram_media"
+        " WHERE timestamp >= :start AND timestamp < :end"
+        " AND (timestamp AT TIME ZONE 'UTC')::date = ANY(:days)"
+        " GROUP BY 1",
+        params,
+    )
+    # A post counts once per distinct tag, however often the caption repeats it.
+    replace_hashtag_days(
+        conn,
+        "instagram",
+        params["days"],
+        "SELECT hashtag, day, COUNT(*) AS posts,"
+        " COALESCE(SUM(like_count), 0) AS likes, COALESCE(SUM(comments_count), 0) AS comments"
+        " FROM (SELECT DISTINCT id, lower(tag[1]) AS hashtag, (timestamp AT TIME ZONE 'UTC')::date AS day,"
+        " like_count, comments_count"
+        " FROM instagram_media CROSS JOIN LATERAL regexp_matches(caption, '#(\\w+)', 'g') AS tag"
+        " WHERE timestamp >= :start AND timestamp < :end"
+        " AND (timestamp AT TIME ZONE 'UTC')::date = ANY(:days)) AS tagged"
+        " GROUP BY 1, 2",
+        params,
+    )
+
+
+def upsert_media(db: Session, payloads: list[dict]) -> tuple[int, int]:
+    """Insert new rows and rewrite existing ones only when a column changed.
+
+    Returns ``(inserted, updated)``; unchanged rows are not touched at all, so
+    they cost no WAL. Account and hashtag rollups for the affected days are
+    refreshed in the same transaction, which the caller owns.
+    """
+    payloads = _storable(payloads)
+    if not payloads:
+        return 0, 0
+    ensure_partitions(db, (payload["timestamp"] for payload in payloads))
+    stmt = insert(InstagramMedia).values(payloads)
+    update_cols = {name: stmt.excluded[name] for name in MUTABLE_COLUMNS}
+    changed = or_(
+        *(getattr(InstagramMedia, name).is_distinct_from(stmt.excluded[name]) for name in MUTABLE_COLUMNS)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(conflict_columns(db)), set_=update_cols, where=changed
+    ).returning(literal_column("xmax = 0").label("inserted"))
+    rows = db.execute(stmt).all()
+    if rows:
+        refresh_rollups(db, payloads)
+    inserted = sum(1 for row in rows if row.inserted)
+    return inserted, len(rows) - inserted
+
+
+COPY_COLUMNS = ("id",) + MUTABLE_COLUMNS
+
+
+def _csv_field(value) -> str:
+    # Only NULL is written as a bare empty field; every string is quoted so
+    # that "" and text looking like a NULL marker survive COPY unchanged.
+    if value is None:
+        return ""
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class _CsvStream(io.RawIOBase):
+    """File-like view over rows rendered as CSV on demand, for ``COPY FROM STDIN``."""
+
+    def __init__(self, rows: Iterable[dict]):
+        self._lines = self._render(rows)
+        self._pending = b""
+
+    @staticmethod
+    def _render(rows: Iterable[dict]) -> Iterator[bytes]:
+        for row in rows:
+            line = ",".join(_csv_field(row.get(col)) for col in COPY_COLUMNS)
+            yield f"{line}\n".encode("utf-8")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while len(self._pending) < len(target):
+            chunk = next(self._lines, None)
+            if chunk is None:
+                break
+            self._pending += chunk
+        size = min(len(target), len(self._pending))
+        target[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def bulk_load_media(db: Session, payloads: list[dict]) -> tuple[int, int]:
+    """COPY rows into a temp staging table, then merge them into ``instagram_media``.
+
+    Same semantics as ``upsert_media`` (only changed rows are rewritten), but
+    rows travel through the COPY protocol instead of one huge parameterised
+    INSERT, which matters for backfills of many thousands of rows.
+    """
+    payloads = _storable(payloads)
+    if not payloads:
+        return 0, 0
+    ensure_partitions(db, (payload["timestamp"] for payload in payloads))
+    db.execute(
+        text(
+            "CREATE TEMP TABLE IF NOT EXISTS instagram_media_staging"
+            " (LIKE instagram_media INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+    )
+    columns = ", ".join(COPY_COLUMNS)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY instagram_media_staging ({columns}) FROM STDIN WITH (FORMAT csv)",
+            _CsvStream(payloads),
+        )
+    finally:
+        cursor.close()
+
+    assignments = ", ".join(f"{name} = EXCLUDED.{name}" for name in MUTABLE_COLUMNS)
+    changed = " OR ".join(
+        f"instagram_media.{name} IS DISTINCT FROM EXCLUDED.{name}" for name in MUTABLE_COLUMNS
+    )
+    key = ", ".join(conflict_columns(db))
+    rows = db.execute(
+        text(
+            f"INSERT INTO instagram_media ({columns})"
+            f" SELECT DISTINCT ON ({key}) {columns} FROM instagram_media_staging"
+            f" ORDER BY {key}"
+            f" ON CONFLICT ({key}) DO UPDATE SET {assignments} WHERE {changed}"
+            " RETURNING xmax = 0 AS inserted"
+        )
+    ).all()
+    db.execute(text("TRUNCATE instagram_media_staging"))
+    if rows:
+        refresh_rollups(db, payloads)
+    inserted = sum(1 for row in rows if row.inserted)
+    return inserted, len(rows) - inserted
+
+
+def backfill_media(
+    client: MetaClient,
+    db: Session,
+    page_size: int = 100,
+    chunk_size: int = 500,
+    max_pages: int | None = None,
+    resume: bool = True,
+) -> dict:
+    """Page through the account's media and upsert it in bounded chunks.
+
+    Pages are buffered until ``chunk_size`` rows, then committed together
+    with the cursor of the last buffered page, so an interrupted run resumes
+    right after the last chunk that reached the database. A finished
+    backfill (or ``resume=False``) starts again from the newest media.
+    """
+    state = db.get(InstagramIngestCursor, client.ig_id)
+    if state is None:
+        state = InstagramIngestCursor(account_id=client.ig_id, pages=0, items=0, completed=False)
+        db.add(state)
+    if not resume or state.completed:
+        state.cursor, state.pages, state.items, state.completed = None, 0, 0, False
+
+    buffered: dict[str, dict] = {}
+    buffered_pages = pages = items = 0
+    status = "partial"
+    try:
+        for page, next_cursor in client.iter_media_pages(page_size=page_size, after=state.cursor):
+            for item in page:
+                payload = InstagramMedia.serialize(item)
+                buffered[payload["id"]] = payload
+            pages += 1
+            buffered_pages += 1
+            done = next_cursor is None
+            limit_hit = bool(max_pages) and pages >= max_pages
+            if not (done or limit_hit or len(buffered) >= chunk_size):
+                continue
+
+            bulk_load_media(db, list(buffered.values()))
+            state.cursor = next_cursor
+            state.pages += buffered_pages
+            state.items += len(buffered)
+            state.completed = done
+            db.commit()
+            items += len(buffered)
+            buffered.clear()
+            buffered_pages = 0
+
+            if done:
+                status = "completed"
+            if done or limit_hit:
+                break
+    except (httpx.HTTPError, RateLimited) as exc:
+        logger.warning("Backfill interrupted after %d pages: %s", pages, exc)
+        db.rollback()
+        status = "interrupted"
+
+    return {
+        "status": status,
+        "pages": pages,
+        "items": items,
+        "cursor": None if status == "completed" else state.cursor,
+        "total_pages": state.pages,
+        "total_items": state.items,
+    }
+
+
+def sync_media(
+    client: MetaClient,
+    db: Session,
+    page_size: int = 100,
+    refresh_window: timedelta = timedelta(hours=48),
+    max_pages: int | None = None,
+) -> dict:
+    """Fetch only media newer than the stored watermark.
+
+    Paging runs newest-first and stops at media older than the watermark minus
+    ``refresh_window``; the window keeps counters of recent posts fresh. The
+    first sync for an account reads a single page (use the backfill for
+    history). The watermark only advances once the whole delta is stored, so
+    an interrupted sync is simply repeated.
+    """
+    mark = db.get(InstagramSyncWatermark, client.ig_id)
+    if mark is None:
+        mark = InstagramSyncWatermark(account_id=client.ig_id)
+        db.add(mark)
+    stop_before = mark.newest_timestamp - refresh_window if mark.newest_timestamp else None
+    if stop_before is None:
+        max_pages = 1
+
+    newest = mark.newest_timestamp
+    fetched = inserted = updated = pages = 0
+    reached_watermark = False
+    status = "completed"
+    try:
+        for page, _ in client.iter_media_pages(page_size=page_size):
+            pages += 1
+            payloads: dict[str, dict] = {}
+            for item in page:
+                payload = InstagramMedia.serialize(item)
+                ts = payload["timestamp"]
+                if stop_before and ts and ts < stop_before:
+                    reached_watermark = True
+                    break
+                payloads[payload["id"]] = payload
+                if ts and (newest is None or ts > newest):
+                    newest = ts
+
+            fetched += len(payloads)
+            page_inserted, page_updated = upsert_media(db, list(payloads.values()))
+            db.commit()
+            inserted += page_inserted
+            updated += page_updated
+            if reached_watermark or (max_pages and pages >= max_pages):
+                break
+    except (httpx.HTTPError, RateLimited) as exc:
+        logger.warning("Incremental sync interrupted after %d pages: %s", pages, exc)
+        db.rollback()
+        status = "interrupted"
+
+    if status == "completed":
+        now = datetime.now(timezone.utc)
+        mark = db.merge(mark)
+        mark.newest_timestamp = newest
+        mark.last_synced_at = now
+        if inserted:
+            mark.last_inserted_at = now
+        db.commit()
+
+    return {
+        "status": status,
+        "pages": pages,
+        "fetched": fetched,
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": fetched - inserted - updated,
+        "reached_watermark": reached_watermark,
+        "watermark": {
+            "newest_timestamp": mark.newest_timestamp,
+            "last_inserted_at": mark.last_inserted_at,
+            "last_synced_at": mark.last_synced_at,
+        },
+    }
+
+
+# Advisory lock key (via hashtext) taken around each scheduled sync pass.
+SYNC_LOCK = "instagram_media_sync"
+
+
+def run_sync_loop(stop: threading.Event, interval_s: float) -> None:
+    """Run ``sync_media`` every ``interval_s`` until ``stop`` is set.
+
+    Keeps the database fresh so read paths never have to trigger a live
+    Graph API fetch themselves. Every worker and replica runs this loop; a
+    session-level advisory lock, held on its own autocommit connection for
+    the length of a pass, lets one of them sync while the rest skip the turn.
+    """
+    while not stop.is_set():
+        try:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock:
+                if lock.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": SYNC_LOCK}).scalar():
+                    try:
+                        _scheduled_sync()
+                    finally:
+                        lock.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": SYNC_LOCK})
+                else:
+                    logger.debug("Scheduled sync skipped: another process holds the lock")
+        except Exception:
+            logger.exception("Scheduled sync failed")
+        stop.wait(interval_s)
+
+
+def _scheduled_sync() -> None:
+    with SessionLocal() as db:
+        summary = sync_media(
+            MetaClient(
+                priority=PRIORITY_BACKGROUND,
+                max_wait=settings.RATE_LIMIT_BACKGROUND_MAX_WAIT,
+            ),
+            db,
+        )
+    logger.info(
+        "Scheduled sync: %s, %d inserted, %d updated",
+        summary["status"],
+        summary["inserted"],
+        summary["updated"],
+    )
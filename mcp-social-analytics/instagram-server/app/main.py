@@ -1,21 +1,65 @@
 from __future__ import annotations
 
-from fastapi import Depends, FastAPI, HTTPException, Query
-from sqlalchemy import text
-from sqlalchemy.dialects.postgresql import insert
+import asyncio
+import base64
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, text, tuple_
 from sqlalchemy.orm import Session
 
-from common import HashtagInsights, HealthResponse, MediaItem
+from common import (
+    EngagementPoint,
+    EngagementSummary,
+    HashtagBatchRequest,
+    HashtagBatchResponse,
+    HashtagInsights,
+    HealthResponse,
+    MediaItem,
+)
+from common.hashtags import batch_tags
+from common.ratelimit import install_rate_limit_handler
+from common.rollups import account_series, account_summary, hashtag_series, hashtag_summary, normalize_tag
+from common.upstream import build_cache, build_http_client
 
-from .deps import Base, MetaClient, engine, get_db
+from .deps import Base, MetaClient, engine, get_db, settings
+from .ingest import backfill_media, run_sync_loop, sync_media, upsert_media
 from .models import InstagramMedia
+from .storage import ensure_default_partition
+
+sync_stop = threading.Event()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(Base.metadata.create_all, bind=engine)
+    await run_in_threadpool(ensure_default_partition, engine)
+    if settings.SYNC_INTERVAL_SECONDS > 0:
+        threading.Thread(
+            target=run_sync_loop,
+            args=(sync_stop, settings.SYNC_INTERVAL_SECONDS),
+            name="ig-sync",
+            daemon=True,
+        ).start()
+    # Pooled async client for request handlers; reuses TLS sessions and
+    # keep-alive connections to graph.facebook.com across requests.
+    app.state.http = build_http_client(settings)
+    app.state.cache = build_cache("instagram", settings)
+    try:
+        yield
+    finally:
+        await app.state.cache.close()
+        sync_stop.set()
+        await app.state.http.aclose()
 
-app = FastAPI(title="Instagram Analytics")
 
+app = FastAPI(title="Instagram Analytics", lifespan=lifespan)
 
-@app.on_event("startup")
-def startup() -> None:
-    Base.metadata.create_all(bind=engine)
+install_rate_limit_handler(app)
 
 
 @app.get("/healthz", response_model=HealthResponse)
@@ -27,21 +71,18 @@ def health(db: Session = Depends(get_db)) -> HealthResponse:
     return HealthResponse(service="instagram-server")
 
 
+@app.get("/cache/stats")
+async def cache_stats(request: Request) -> dict:
+    return request.app.state.cache.stats()
+
+
 @app.get("/oauth/callback")
-def oauth_callback(code: str, client: MetaClient = Depends(MetaClient.dep)) -> dict:
-    token = client.exchange_code_for_token(code)
+async def oauth_callback(code: str, client: MetaClient = Depends(MetaClient.dep)) -> dict:
+    token = await client.exchange_code_for_token(code)
     return {"token_saved": bool(token)}
 
 
-@app.get("/metrics/hashtag", response_model=HashtagInsights)
-def hashtag_metrics(
-    tag: str = Query(..., min_length=1),
-    client: MetaClient = Depends(MetaClient.dep),
-) -> HashtagInsights:
-    data = client.fetch_hashtag_insights(tag)
-    if not data:
-        raise HTTPException(status_code=404, detail="No data")
-
+def _hashtag_insights(tag: str, data: dict) -> HashtagInsights:
     top_posts = [
         MediaItem(
             id=str(item.get("id")),
@@ -63,9 +104,103 @@ def hashtag_metrics(
     )
 
 
+async def _cached_hashtag(request: Request, client: MetaClient, tag: str) -> Optional[dict]:
+    # Public posts of other accounts: nothing stores them, so this stays a
+    # live read. The hashtag rollups aggregate this account's own media.
+    return await request.app.state.cache.get_or_fetch(
+        "metrics/hashtag", {"tag": normalize_tag(tag)}, lambda: client.fetch_hashtag_insights(tag)
+    )
+
+
+@app.get("/metrics/hashtag", response_model=HashtagInsights)
+async def hashtag_metrics(
+    request: Request,
+    tag: str = Query(..., min_length=1),
+    client: MetaClient = Depends(MetaClient.dep),
+) -> HashtagInsights:
+    data = await _cached_hashtag(request, client, tag)
+    if not data:
+        raise HTTPException(status_code=404, detail="No data")
+    return _hashtag_insights(tag, data)
+
+
+@app.post("/metrics/hashtag/batch", response_model=HashtagBatchResponse)
+async def hashtag_batch(
+    req: HashtagBatchRequest,
+    request: Request,
+    client: MetaClient = Depends(MetaClient.dep),
+) -> HashtagBatchResponse:
+    """Insights for many tags, fetched one by one through the cache.
+
+    The Graph API has no multi-hashtag call, so HASHTAG_BATCH_CONCURRENCY
+    tags are fetched at a time instead.
+    """
+    tags = batch_tags(req.tags, settings.HASHTAG_BATCH_MAX)
+    slots = asyncio.Semaphore(settings.HASHTAG_BATCH_CONCURRENCY)
+
+    async def one(tag: str) -> Optional[dict]:
+        async with slots:
+            return await _cached_hashtag(request, client, tag)
+
+    results = await asyncio.gather(*(one(tag) for tag in tags), return_exceptions=True)
+    response = HashtagBatchResponse()
+    for tag, result in zip(tags, results):
+        if isinstance(result, BaseException):
+            response.errors[tag] = str(result)
+        elif result:
+            response.items.append(_hashtag_insights(tag, result))
+        else:
+            response.missing.append(tag)
+    return response
+
+
+@app.get("/metrics/hashtag/summary", response_model=EngagementSummary)
+def hashtag_engagement(
+    tag: str = Query(..., min_length=1),
+    days: int = Query(30, ge=1, le=3660),
+    db: Session = Depends(get_db),
+) -> EngagementSummary:
+    """Engagement of this account's posts carrying ``tag``, from the rollups."""
+    return hashtag_summary(db.connection(), "instagram", tag, days)
+
+
+@app.get("/metrics/hashtag/history", response_model=list[EngagementPoint])
+def hashtag_history(
+    tag: str = Query(..., min_length=1),
+    days: int = Query(90, ge=1, le=3660),
+    db: Session = Depends(get_db),
+) -> list[EngagementPoint]:
+    return hashtag_series(db.connection(), "instagram", tag, days)
+
+
+def _account_summary(days: int) -> EngagementSummary:
+    with engine.connect() as conn:
+        return account_summary(conn, "instagram", settings.META_IG_BUSINESS_ID, days)
+
+
 @app.get("/metrics/account")
-def account_metrics(client: MetaClient = Depends(MetaClient.dep)) -> dict:
-    return client.fetch_account_insights()
+async def account_metrics(
+    days: int = Query(30, ge=1, le=3660),
+    client: MetaClient = Depends(MetaClient.dep),
+) -> dict:
+    """Live profile counts plus engagement over ``days``, summed from the rollups."""
+    profile, engagement = await asyncio.gather(
+        client.fetch_account_insights(), run_in_threadpool(_account_summary, days)
+    )
+    return {**profile, "engagement": engagement.model_dump()}
+
+
+@app.get("/metrics/account/summary", response_model=EngagementSummary)
+def account_engagement(days: int = Query(30, ge=1, le=3660)) -> EngagementSummary:
+    return _account_summary(days)
+
+
+@app.get("/metrics/account/history", response_model=list[EngagementPoint])
+def account_history(
+    days: int = Query(90, ge=1, le=3660),
+    db: Session = Depends(get_db),
+) -> list[EngagementPoint]:
+    return account_series(db.connection(), "instagram", settings.META_IG_BUSINESS_ID, days)
 
 
 @app.get("/ingest/recent_media")
@@ -77,23 +212,133 @@ def ingest_recent_media(
     items = client.fetch_recent_media(limit=limit)
     payloads = [InstagramMedia.serialize(item) for item in items]
 
+    inserted = updated = 0
     if payloads:
-        stmt = insert(InstagramMedia).values(payloads)
-        update_cols = {
-            "caption": stmt.excluded.caption,
-            "media_type": stmt.excluded.media_type,
-            "media_url": stmt.excluded.media_url,
-            "timestamp": stmt.excluded.timestamp,
-            "like_count": stmt.excluded.like_count,
-            "comments_count": stmt.excluded.comments_count,
-        }
-        stmt = stmt.on_conflict_do_update(index_elements=[InstagramMedia.id], set_=update_cols)
         try:
-            db.execute(stmt)
+            inserted, updated = upsert_media(db, payloads)
             db.commit()
         except Exception as exc:  # pragma: no cover - transactional guard
             db.rollback()
             raise HTTPException(status_code=500, detail="Failed to persist media") from exc
 
     media_items = [MediaItem(**payload) for payload in payloads]
-    return {"count": len(media_items), "items": media_items}
+    return {
+        "count": len(media_items),
+        "inserted": inserted,
+        "updated": updated,
+        "items": media_items,
+    }
+
+
+@app.post("/ingest/backfill")
+def ingest_backfill(
+    page_size: int = Query(100, ge=1, le=100),
+    chunk_size: int = Query(500, ge=1, le=5000),
+    max_pages: int | None = Query(None, ge=1),
+    resume: bool = True,
+    client: MetaClient = Depends(MetaClient.background_dep),
+    db: Session = Depends(get_db),
+) -> dict:
+    """Follow media cursors page by page, committing every ``chunk_size`` rows.
+
+    Call repeatedly (e.g. with ``max_pages``) to walk an account's full
+    history; each call continues from the last committed cursor.
+    """
+    try:
+        return backfill_media(
+            client,
+            db,
+            page_size=page_size,
+            chunk_size=chunk_size,
+            max_pages=max_pages,
+            resume=resume,
+        )
+    except Exception as exc:  # pragma: no cover - transactional guard
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to persist media") from exc
+
+
+@app.post("/ingest/sync")
+def ingest_sync(
+    page_size: int = Query(100, ge=1, le=100),
+    refresh_window_hours: int = Query(48, ge=0),
+    max_pages: int | None = Query(None, ge=1),
+    client: MetaClient = Depends(MetaClient.background_dep),
+    db: Session = Depends(get_db),
+) -> dict:
+    try:
+        return sync_media(
+            client,
+            db,
+            page_size=page_size,
+            refresh_window=timedelta(hours=refresh_window_hours),
+            max_pages=max_pages,
+        )
+    except Exception as exc:  # pragma: no cover - transactional guard
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to persist media") from exc
+
+
+def _encode_cursor(ts: datetime, media_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{media_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        ts, media_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(ts), media_id
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail="Invalid cursor") from exc
+
+
+@app.get("/media")
+def list_media(
+    days: int = Query(7, ge=1, le=3660),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+) -> dict:
+    """Stored media in a time window, newest first, with keyset paging.
+
+    Read-only: never calls the Graph API. ``since`` defaults to ``days`` ago.
+    """
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(days=days)
+    stmt = (
+        select(InstagramMedia)
+        .where(InstagramMedia.timestamp >= since, InstagramMedia.timestamp < until)
+        .order_by(InstagramMedia.timestamp.desc(), InstagramMedia.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        stmt = stmt.where(
+            tuple_(InstagramMedia.timestamp, InstagramMedia.id) < tuple_(*_decode_cursor(cursor))
+        )
+    rows = db.execute(stmt).scalars().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].timestamp, rows[-1].id)
+
+    items = [
+        MediaItem(
+            id=row.id,
+            platform="instagram",
+            caption=row.caption,
+            media_type=row.media_type,
+            media_url=row.media_url,
+            timestamp=row.timestamp,
+            like_count=row.like_count,
+            comments_count=row.comments_count,
+        )
+        for row in rows
+    ]
+    return {
+        "count": len(items),
+        "items": items,
+        "next_cursor": next_cursor,
+        "window": {"since": since, "until": until},
+    }
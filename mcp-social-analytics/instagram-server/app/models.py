@@ -2,20 +2,28 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String
 from sqlalchemy.sql import func
 
 from .deps import Base
 
 
 class InstagramMedia(Base):
+    """Media rows, range-partitioned by month on ``timestamp``.
+
+    Postgres requires the partition key in every unique constraint, so the
+    primary key is ``(id, timestamp)``; a media item's timestamp never changes.
+    Monthly partitions are created on demand by ``storage.ensure_partitions``.
+    """
+
     __tablename__ = "instagram_media"
+    __table_args__ = {"postgresql_partition_by": "RANGE (timestamp)"}
 
     id = Column(String, primary_key=True)
     caption = Column(String)
     media_type = Column(String(32))
     media_url = Column(String)
-    timestamp = Column(DateTime(timezone=True))
+    timestamp = Column(DateTime(timezone=True), primary_key=True)
     like_count = Column(Integer)
     comments_count = Column(Integer)
     inserted_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -37,6 +45,48 @@ class InstagramMedia(Base):
         }
 
 
+Index("ix_instagram_media_timestamp", InstagramMedia.timestamp.desc())
+Index("ix_instagram_media_inserted_at", InstagramMedia.inserted_at)
+Index(
+    "ix_instagram_media_engagement",
+    (func.coalesce(InstagramMedia.like_count, 0) + func.coalesce(InstagramMedia.comments_count, 0)).desc(),
+)
+
+
+class InstagramHashtagId(Base):
+    """Persisted hashtag name -> ID lookups (see ``deps.HashtagIdCache``)."""
+
+    __tablename__ = "instagram_hashtag_ids"
+
+    hashtag = Column(String, primary_key=True)
+    hashtag_id = Column(String, nullable=False)
+    resolved_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class InstagramIngestCursor(Base):
+    """Resume point of a paginated media backfill, one row per account."""
+
+    __tablename__ = "instagram_ingest_cursors"
+
+    account_id = Column(String, primary_key=True)
+    cursor = Column(String)
+    pages = Column(Integer, nullable=False, default=0)
+    items = Column(Integer, nullable=False, default=0)
+    completed = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class InstagramSyncWatermark(Base):
+    """High-water marks of the incremental media sync, one row per account."""
+
+    __tablename__ = "instagram_sync_watermarks"
+
+    account_id = Column(String, primary_key=True)
+    newest_timestamp = Column(DateTime(timezone=True))
+    last_inserted_at = Column(DateTime(timezone=True))
+    last_synced_at = Column(DateTime(timezone=True))
+
+
 def _parse_timestamp(value: str) -> datetime | None:
     try:
         if value.endswith("Z"):
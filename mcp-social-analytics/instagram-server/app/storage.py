@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+MIGRATION = "infra/postgres/migrations/001_partition_instagram_media.sql"
+
+# Set at startup by ensure_default_partition. False on a database that still
+# has the pre-partitioning table, where partitions cannot be created.
+_partitioned: bool | None = None
+
+
+def _month_start(ts: datetime) -> datetime:
+    ts = ts.astimezone(timezone.utc)
+    return datetime(ts.year, ts.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(month: datetime) -> datetime:
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def is_partitioned(conn: Connection | Session) -> bool:
+    return bool(
+        conn.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table"
+                " WHERE partrelid = to_regclass('instagram_media'))"
+            )
+        ).scalar()
+    )
+
+
+def _layout_partitioned(db: Session) -> bool:
+    global _partitioned
+    if _partitioned is None:
+        _partitioned = is_partitioned(db)
+    return _partitioned
+
+
+def conflict_columns(db: Session) -> tuple[str, ...]:
+    """Upsert conflict target matching the table's primary key.
+
+    The partitioned table is keyed on ``(id, timestamp)``; a database that has
+    not run the partition migration still has ``PRIMARY KEY (id)``.
+    """
+    return ("id", "timestamp") if _layout_partitioned(db) else ("id",)
+
+
+def ensure_default_partition(engine: Engine) -> bool:
+    """Catch-all partition so a write never fails for lack of a month.
+
+    Returns False, after logging what to run, on a database where
+    ``instagram_media`` is still a plain table; writes then upsert on its
+    ``id`` key and no partitions are created.
+    """
+    global _partitioned
+    with engine.begin() as conn:
+        _partitioned = is_partitioned(conn)
+        if not _partitioned:
+            logger.error(
+                "instagram_media is not partitioned; run %s, then restart the service."
+                " Until then media is upserted on the old id primary key, unpartitioned.",
+                MIGRATION,
+            )
+            return False
+        conn.execute(
+            text("CREATE TABLE IF NOT EXISTS instagram_media_default PARTITION OF instagram_media DEFAULT")
+        )
+    return True
+
+
+def ensure_partitions(db: Session, timestamps: Iterable[datetime | None]) -> None:
+    """Create the monthly ``instagram_media`` partitions covering ``timestamps``.
+
+    Runs in the caller's transaction, before rows for a new month are
+    written: Postgres refuses to create a month partition while the default
+    partition already holds rows in its range. Existing partitions are a
+    catalog lookup; missing ones are created under a transaction-scoped
+    advisory lock, because ``IF NOT EXISTS`` does not stop two sessions
+    creating the same partition at once (the loser fails with a duplicate
+    relation and would roll back its whole upsert).
+    """
+    if not _layout_partitioned(db):
+        return
+    months = sorted({_month_start(ts) for ts in timestamps if ts is not None})
+    missing = [
+        month
+        for month in months
+        if db.execute(text("SELECT to_regclass(:name)"), {"name": f"instagram_media_{month:%Y_%m}"}).scalar()
+        is None
+    ]
+    if not missing:
+        return
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext('instagram_media_partitions'))"))
+    for month in missing:
+        # Values are derived from datetimes, and DDL cannot take bind parameters.
+        db.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS instagram_media_{month:%Y_%m} PARTITION OF instagram_media"
+                f" FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            )
+        )
@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pytest
+
+from app import storage
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeConnection:
+    """Records statements; answers the partitioning probe with ``partitioned``."""
+
+    def __init__(self, partitioned: bool):
+        self.partitioned = partitioned
+        self.statements: list[str] = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if "pg_partitioned_table" in sql:
+            return FakeResult(self.partitioned)
+        return FakeResult(None)
+
+
+class FakeEngine:
+    def __init__(self, conn: FakeConnection):
+        self.conn = conn
+
+    @contextmanager
+    def begin(self):
+        yield self.conn
+
+
+@pytest.fixture(autouse=True)
+def reset_layout(monkeypatch):
+    monkeypatch.setattr(storage, "_partitioned", None)
+
+
+def test_unmigrated_table_upserts_on_id():
+    conn = FakeConnection(partitioned=False)
+
+    assert storage.ensure_default_partition(FakeEngine(conn)) is False
+    assert storage.conflict_columns(conn) == ("id",)
+
+    storage.ensure_partitions(conn, [datetime(2024, 5, 1, tzinfo=timezone.utc)])
+    assert not any("CREATE TABLE" in sql for sql in conn.statements)
+
+
+def test_partitioned_table_upserts_on_id_and_timestamp():
+    conn = FakeConnection(partitioned=True)
+
+    assert storage.ensure_default_partition(FakeEngine(conn)) is True
+    assert storage.conflict_columns(conn) == ("id", "timestamp")
+
+    storage.ensure_partitions(conn, [datetime(2024, 5, 1, tzinfo=timezone.utc)])
+    assert any("instagram_media_2024_05 PARTITION OF" in sql for sql in conn.statements)
+
+
+def test_layout_is_probed_lazily_without_startup():
+    conn = FakeConnection(partitioned=False)
+
+    assert storage.conflict_columns(conn) == ("id",)
@@ -5,16 +5,37 @@ from functools import lru_cache
 from typing import Optional
 
 import httpx
+from fastapi import Request
 from pydantic_settings import BaseSettings
+from sqlalchemy.engine import Engine
+
+from common.ratelimit import PRIORITY_INTERACTIVE, get_bucket, send_async
+from common.rollups import create_rollup_engine, normalize_tag
+from common.upstream import UpstreamSettings
 
 logger = logging.getLogger(__name__)
 
 
-class Settings(BaseSettings):
+class Settings(UpstreamSettings, BaseSettings):
     TIKTOK_CLIENT_KEY: str
     TIKTOK_CLIENT_SECRET: str
     TIKTOK_ACCESS_TOKEN: str
 
+    # Token bucket per access token; rate-limit headers tighten it further.
+    RATE_LIMIT_PER_SECOND: float = 5.0
+    RATE_LIMIT_BURST: int = 20
+    RATE_LIMIT_RETRIES: int = 3
+    # Longest a request waits on the limiter before answering 429.
+    RATE_LIMIT_MAX_WAIT: float = 10.0
+
+    # /metrics/hashtag/batch: tags per hashtag_names call, and calls in flight.
+    HASHTAG_BATCH_SIZE: int = 20
+    HASHTAG_BATCH_CONCURRENCY: int = 4
+    HASHTAG_BATCH_MAX: int = 200
+
+    # Postgres URL for daily hashtag rollups; unset disables them.
+    DATABASE_URL: Optional[str] = None
+
     class Config:
         env_file = ".env"
 
@@ -24,46 +45,90 @@ def get_settings() -> Settings:
     return Settings()
 
 
+@lru_cache(maxsize=1)
+def get_rollup_engine() -> Optional[Engine]:
+    return create_rollup_engine(get_settings().DATABASE_URL)
+
+
 class TikTokClient:
-    def __init__(self, settings: Settings | None = None):
+    def __init__(self, http: httpx.AsyncClient, settings: Settings | None = None):
+        self.http = http
         self.settings = settings or get_settings()
         self.base_url = "https://open.tiktokapis.com/v2"
         self._headers = {
             "Authorization": f"Bearer {self.settings.TIKTOK_ACCESS_TOKEN}",
             "Content-Type": "application/json",
         }
+        self.priority = PRIORITY_INTERACTIVE
+        self.bucket = get_bucket(
+            "tiktok",
+            self.settings.TIKTOK_ACCESS_TOKEN,
+            self.settings.RATE_LIMIT_PER_SECOND,
+            self.settings.RATE_LIMIT_BURST,
+        )
 
     @staticmethod
-    def dep() -> "TikTokClient":
-        return TikTokClient()
+    def dep(request: Request) -> "TikTokClient":
+        return TikTokClient(request.app.state.http)
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return await send_async(
+            self.bucket,
+            lambda: self.http.request(method, url, **kwargs),
+            priority=self.priority,
+            max_retries=self.settings.RATE_LIMIT_RETRIES,
+            max_wait=self.settings.RATE_LIMIT_MAX_WAIT,
+        )
+
+    async def fetch_hashtag_insights(self, tag: str) -> Optional[dict]:
+        return (await self.fetch_hashtag_insights_batch([tag])).get(tag)
 
-    def fetch_hashtag_insights(self, tag: str) -> Optional[dict]:
+    def hashtag_batches(self, tags: list[str]) -> list[list[str]]:
+        size = self.settings.HASHTAG_BATCH_SIZE
+        return [tags[start : start + size] for start in range(0, len(tags), size)]
+
+    async def fetch_hashtag_insights_batch(self, tags: list[str]) -> dict[str, dict]:
+        """Insights for several tags in one ``hashtag_names`` call, keyed by input tag.
+
+        Tags the API returns nothing for are left out.
+        """
         endpoint = f"{self.base_url}/insights/hashtag/overview/"
-        payload = {"hashtag_names": [tag]}
+        payload = {"hashtag_names": [tag.lstrip("#") for tag in tags]}
         try:
-            response = httpx.post(endpoint, json=payload, headers=self._headers, timeout=30)
+            response = await self._request("POST", endpoint, json=payload, headers=self._headers)
             response.raise_for_status()
-            data = response.json()
-            summary = data.get("data", {}).get("hashtag_insights", [])
-            if not summary:
-                return None
-            insight = summary[0]
-            return {
+            summary = response.json().get("data", {}).get("hashtag_insights", [])
+        except httpx.HTTPError as exc:
+            logger.warning("TikTok hashtag insights failed: %s", exc)
+            return {}
+
+        by_name = {
+            normalize_tag(insight["hashtag_name"]): insight
+            for insight in summary
+            if insight.get("hashtag_name")
+        }
+        results = {}
+        for index, tag in enumerate(tags):
+            insight = by_name.get(normalize_tag(tag))
+            if insight is None and not by_name and len(summary) == len(tags):
+                # Unnamed entries come back in request order.
+                insight = summary[index]
+            if insight is None:
+                continue
+            results[tag] = {
                 "hashtag": tag,
                 "impressions": insight.get("views"),
                 "reach": insight.get("reach"),
                 "avg_engagement_rate": insight.get("engagement_rate"),
                 "top_posts": insight.get("top_videos", []),
             }
-        except httpx.HTTPError as exc:
-            logger.warning("TikTok hashtag insights failed: %s", exc)
-            return None
+        return results
 
-    def fetch_creator_videos(self, count: int = 10) -> list[dict]:
+    async def fetch_creator_videos(self, count: int = 10) -> list[dict]:
         endpoint = f"{self.base_url}/insights/video/list/"
         payload = {"max_count": count}
         try:
-            response = httpx.post(endpoint, json=payload, headers=self._headers, timeout=30)
+            response = await self._request("POST", endpoint, json=payload, headers=self._headers)
             response.raise_for_status()
             return response.json().get("data", {}).get("videos", [])
         except httpx.HTTPError as exc:
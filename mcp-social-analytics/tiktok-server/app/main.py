@@ -1,16 +1,47 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from typing import Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 
-from common import HashtagInsights, HealthResponse, MediaItem
+from common import (
+    EngagementPoint,
+    HashtagBatchRequest,
+    HashtagBatchResponse,
+    HashtagInsights,
+    HealthResponse,
+    MediaItem,
+)
+from common.hashtags import batch_tags
+from common.ratelimit import install_rate_limit_handler
+from common.rollups import hashtag_series, normalize_tag, record_hashtag_safely, record_hashtags_safely
+from common.upstream import build_cache, build_http_client
 
-from .deps import TikTokClient
+from .deps import TikTokClient, get_rollup_engine, get_settings
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="TikTok Analytics")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client per process so TLS sessions and keep-alive
+    # connections to the platform API are reused across requests.
+    app.state.http = build_http_client(get_settings())
+    app.state.cache = build_cache("tiktok", get_settings())
+    try:
+        yield
+    finally:
+        await app.state.cache.close()
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="TikTok Analytics", lifespan=lifespan)
+
+install_rate_limit_handler(app)
 
 
 @app.get("/healthz", response_model=HealthResponse)
@@ -18,15 +49,12 @@ def healthz() -> HealthResponse:
     return HealthResponse(service="tiktok-server")
 
 
-@app.get("/metrics/hashtag", response_model=HashtagInsights)
-def hashtag_metrics(
-    tag: str = Query(..., min_length=1),
-    client: TikTokClient = Depends(TikTokClient.dep),
-) -> HashtagInsights:
-    data = client.fetch_hashtag_insights(tag)
-    if not data:
-        raise HTTPException(status_code=404, detail="No hashtag insights available")
+@app.get("/cache/stats")
+async def cache_stats(request: Request) -> dict:
+    return request.app.state.cache.stats()
+
 
+def _hashtag_insights(tag: str, data: dict) -> HashtagInsights:
     top_posts = [
         MediaItem(
             id=str(item.get("id") or item.get("video_id")),
@@ -48,12 +76,94 @@ def hashtag_metrics(
     )
 
 
+async def _cached_hashtag(request: Request, client: TikTokClient, tag: str) -> Optional[dict]:
+    async def fetch() -> Optional[dict]:
+        data = await client.fetch_hashtag_insights(tag)
+        if data:
+            # Only upstream reads are recorded; cache hits carry no new snapshot.
+            await run_in_threadpool(
+                record_hashtag_safely, get_rollup_engine(), "tiktok", _hashtag_insights(tag, data)
+            )
+        return data
+
+    return await request.app.state.cache.get_or_fetch("metrics/hashtag", {"tag": normalize_tag(tag)}, fetch)
+
+
+@app.get("/metrics/hashtag", response_model=HashtagInsights)
+async def hashtag_metrics(
+    request: Request,
+    tag: str = Query(..., min_length=1),
+    client: TikTokClient = Depends(TikTokClient.dep),
+) -> HashtagInsights:
+    data = await _cached_hashtag(request, client, tag)
+    if not data:
+        raise HTTPException(status_code=404, detail="No hashtag insights available")
+    return _hashtag_insights(tag, data)
+
+
+@app.post("/metrics/hashtag/batch", response_model=HashtagBatchResponse)
+async def hashtag_batch(
+    req: HashtagBatchRequest,
+    request: Request,
+    client: TikTokClient = Depends(TikTokClient.dep),
+) -> HashtagBatchResponse:
+    """Insights for many tags with one ``hashtag_names`` call per HASHTAG_BATCH_SIZE tags.
+
+    Fresh cache entries are served as is; the rest are fetched natively in
+    batches, HASHTAG_BATCH_CONCURRENCY at a time, and written back per tag.
+    """
+    settings = client.settings
+    tags = batch_tags(req.tags, settings.HASHTAG_BATCH_MAX)
+    cache = request.app.state.cache
+    cached = await asyncio.gather(*(cache.peek("metrics/hashtag", {"tag": tag}) for tag in tags))
+    found = {tag: data for tag, data in zip(tags, cached) if data}
+
+    batches = client.hashtag_batches([tag for tag in tags if tag not in found])
+    slots = asyncio.Semaphore(settings.HASHTAG_BATCH_CONCURRENCY)
+
+    async def fetch(batch: list[str]) -> dict[str, dict]:
+        async with slots:
+            return await client.fetch_hashtag_insights_batch(batch)
+
+    results = await asyncio.gather(*(fetch(batch) for batch in batches), return_exceptions=True)
+    response = HashtagBatchResponse()
+    fetched: list[HashtagInsights] = []
+    for batch, result in zip(batches, results):
+        if isinstance(result, BaseException):
+            response.errors.update({tag: str(result) for tag in batch})
+            continue
+        for tag, data in result.items():
+            await cache.put("metrics/hashtag", {"tag": tag}, data)
+            found[tag] = data
+            fetched.append(_hashtag_insights(tag, data))
+    await run_in_threadpool(record_hashtags_safely, get_rollup_engine(), "tiktok", fetched)
+
+    for tag in tags:
+        if tag in found:
+            response.items.append(_hashtag_insights(tag, found[tag]))
+        elif tag not in response.errors:
+            response.missing.append(tag)
+    return response
+
+
+@app.get("/metrics/hashtag/history", response_model=list[EngagementPoint])
+def hashtag_history(
+    tag: str = Query(..., min_length=1),
+    days: int = Query(90, ge=1, le=3660),
+) -> list[EngagementPoint]:
+    engine = get_rollup_engine()
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Rollups are not configured")
+    with engine.connect() as conn:
+        return hashtag_series(conn, "tiktok", tag, days)
+
+
 @app.get("/videos/recent")
-def recent_videos(
+async def recent_videos(
     client: TikTokClient = Depends(TikTokClient.dep),
     count: int = 10,
 ) -> dict:
-    videos = client.fetch_creator_videos(count=count)
+    videos = await client.fetch_creator_videos(count=count)
     items = [
         MediaItem(
             id=str(item.get("id") or item.get("video_id")),
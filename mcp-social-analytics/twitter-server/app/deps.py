@@ -5,14 +5,39 @@ from functools import lru_cache
 from typing import Optional
 
 import httpx
+from fastapi import Request
 from pydantic_settings import BaseSettings
+from sqlalchemy.engine import Engine
+
+from common.ratelimit import PRIORITY_INTERACTIVE, get_bucket, send_async
+from common.rollups import create_rollup_engine, normalize_tag
+from common.upstream import UpstreamSettings
 
 logger = logging.getLogger(__name__)
 
 
-class Settings(BaseSettings):
+class Settings(UpstreamSettings, BaseSettings):
     TWITTER_BEARER_TOKEN: str
 
+    # Token bucket per access token; rate-limit headers tighten it further.
+    RATE_LIMIT_PER_SECOND: float = 0.5
+    RATE_LIMIT_BURST: int = 10
+    RATE_LIMIT_RETRIES: int = 3
+    # Longest a request waits on the limiter before answering 429.
+    RATE_LIMIT_MAX_WAIT: float = 10.0
+
+    # /metrics/hashtag/batch: tags are OR-ed into search queries of at most
+    # this many characters; searches in flight are bounded separately.
+    SEARCH_QUERY_MAX_LENGTH: int = 512
+    HASHTAG_BATCH_CONCURRENCY: int = 2
+    HASHTAG_BATCH_MAX: int = 200
+
+    # Batched results are a share of one search page, cached apart from single tags.
+    CACHE_TTLS: dict[str, float] = {"metrics/hashtag": 300.0, "metrics/hashtag/batch": 300.0}
+
+    # Postgres URL for daily hashtag rollups; unset disables them.
+    DATABASE_URL: Optional[str] = None
+
     class Config:
         env_file = ".env"
 
@@ -22,39 +47,104 @@ def get_settings() -> Settings:
     return Settings()
 
 
+@lru_cache(maxsize=1)
+def get_rollup_engine() -> Optional[Engine]:
+    return create_rollup_engine(get_settings().DATABASE_URL)
+
+
 class TwitterClient:
-    def __init__(self, settings: Settings | None = None):
+    def __init__(self, http: httpx.AsyncClient, settings: Settings | None = None):
+        self.http = http
         self.settings = settings or get_settings()
         self.base = "https://api.twitter.com/2"
         self._headers = {"Authorization": f"Bearer {self.settings.TWITTER_BEARER_TOKEN}"}
+        self.priority = PRIORITY_INTERACTIVE
+        self.bucket = get_bucket(
+            "twitter",
+            self.settings.TWITTER_BEARER_TOKEN,
+            self.settings.RATE_LIMIT_PER_SECOND,
+            self.settings.RATE_LIMIT_BURST,
+        )
 
     @staticmethod
-    def dep() -> "TwitterClient":
-        return TwitterClient()
+    def dep(request: Request) -> "TwitterClient":
+        return TwitterClient(request.app.state.http)
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return await send_async(
+            self.bucket,
+            lambda: self.http.request(method, url, **kwargs),
+            priority=self.priority,
+            max_retries=self.settings.RATE_LIMIT_RETRIES,
+            max_wait=self.settings.RATE_LIMIT_MAX_WAIT,
+        )
 
-    def fetch_hashtag_insights(self, tag: str, max_results: int = 10) -> Optional[dict]:
+    async def fetch_hashtag_insights(self, tag: str, max_results: int = 10) -> Optional[dict]:
         query = f"#{tag.lstrip('#')} lang:en"
+        tweets = await self._search(query, max_results)
+        if tweets is None:
+            return None
+        return self._summarize(tag, tweets)
+
+    def hashtag_batches(self, tags: list[str]) -> list[list[str]]:
+        """Group tags into OR queries that fit the search query length limit."""
+        limit = self.settings.SEARCH_QUERY_MAX_LENGTH - len("() lang:en")
+        batches: list[list[str]] = []
+        length = limit + 1
+        for tag in tags:
+            term = f"#{tag.lstrip('#')}"
+            if length + len(" OR ") + len(term) > limit:
+                batches.append([])
+                length = -len(" OR ")
+            batches[-1].append(tag)
+            length += len(" OR ") + len(term)
+        return batches
+
+    async def fetch_hashtag_insights_batch(self, tags: list[str], max_results: int = 100) -> dict[str, dict]:
+        """Insights for several tags from one OR search, keyed by input tag.
+
+        Tweets are attributed to every requested tag in their hashtag
+        entities, so each tag sees its share of one result page rather than a
+        page of its own. Tags with no tweet in that page are left out.
+        """
+        query = "(" + " OR ".join(f"#{tag.lstrip('#')}" for tag in tags) + ") lang:en"
+        tweets = await self._search(query, max_results)
+        if tweets is None:
+            return {}
+        grouped: dict[str, list[dict]] = {normalize_tag(tag): [] for tag in tags}
+        for tweet in tweets:
+            entities = tweet.get("entities", {}).get("hashtags", [])
+            tweet_tags = {normalize_tag(entity.get("tag", "")) for entity in entities}
+            for key in tweet_tags & grouped.keys():
+                grouped[key].append(tweet)
+        return {
+            tag: self._summarize(tag, grouped[normalize_tag(tag)]) for tag in tags if grouped[normalize_tag(tag)]
+        }
+
+    async def _search(self, query: str, max_results: int) -> Optional[list[dict]]:
         params = {
             "query": query,
-            "max_results": max(max_results, 10),
-            "tweet.fields": "public_metrics,created_at,author_id",
+            "max_results": min(max(max_results, 10), 100),
+            "tweet.fields": "public_metrics,created_at,author_id,entities",
             "expansions": "author_id",
             "user.fields": "name,username,profile_image_url",
         }
         try:
-            response = httpx.get(
+            response = await self._request(
+                "GET",
                 f"{self.base}/tweets/search/recent",
                 params=params,
                 headers=self._headers,
-                timeout=30,
             )
             response.raise_for_status()
             data = response.json()
         except httpx.HTTPError as exc:
             logger.warning("Twitter search failed: %s", exc)
             return None
+        return data.get("data", [])
 
-        tweets = data.get("data", [])
+    @staticmethod
+    def _summarize(tag: str, tweets: list[dict]) -> dict:
         impressions = sum(tweet.get("public_metrics", {}).get("impression_count", 0) for tweet in tweets)
         reach = sum(tweet.get("public_metrics", {}).get("like_count", 0) for tweet in tweets)
 
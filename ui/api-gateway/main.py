@@ -1,34 +1,167 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic_settings import BaseSettings
+from starlette.background import BackgroundTask
 import httpx
 
-app = FastAPI(title="API Gateway")
+
+class Settings(BaseSettings):
+    insights_engine_url: str = "http://insights-engine:8000"
+    content_generator_url: str = "http://content-generator:8000"
+    publisher_url: str = "http://publisher:8000"
+
+    trends_timeout: float = 30.0
+    generate_timeout: float = 60.0
+    # Publishing is queued on the publisher, so only the submission is awaited.
+    publish_timeout: float = 10.0
+
+    trends_concurrency: int = 32
+    generate_concurrency: int = 8
+    publish_concurrency: int = 32
+    # How long a request may wait for a free upstream slot before we shed it.
+    queue_timeout: float = 5.0
+
+    http_max_connections: int = 200
+    http_max_keepalive_connections: int = 50
+    http_keepalive_expiry: float = 30.0
+
+
+settings = Settings()
+
+# Headers worth passing back verbatim; hop-by-hop and length headers are
+# recomputed by the streaming response.
+FORWARDED_HEADERS = ("content-type", "content-encoding", "cache-control")
+
+
+class Upstream:
+    """Per-route timeout and concurrency budget for one upstream service."""
+
+    def __init__(self, name: str, timeout: float, concurrency: int):
+        self.name = name
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(concurrency)
+
+
+trends = Upstream("insights-engine", settings.trends_timeout, settings.trends_concurrency)
+generator = Upstream("content-generator", settings.generate_timeout, settings.generate_concurrency)
+publisher = Upstream("publisher", settings.publish_timeout, settings.publish_concurrency)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    app.state.http = httpx.AsyncClient(limits=limits)
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="API Gateway", lifespan=lifespan)
+
+
+async def proxy(
+    request: Request,
+    upstream: Upstream,
+    url: str,
+    payload: dict | None = None,
+    method: str = "POST",
+    headers: dict[str, str] | None = None,
+) -> StreamingResponse:
+    try:
+        await asyncio.wait_for(upstream.slots.acquire(), settings.queue_timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail=f"{upstream.name} is busy, retry later")
+
+    client: httpx.AsyncClient = request.app.state.http
+    try:
+        response = await client.send(
+            client.build_request(method, url, json=payload, headers=headers, timeout=upstream.timeout),
+            stream=True,
+        )
+    except httpx.TimeoutException as exc:
+        upstream.slots.release()
+        raise HTTPException(status_code=504, detail=f"{upstream.name} timed out") from exc
+    except httpx.RequestError as exc:
+        upstream.slots.release()
+        raise HTTPException(status_code=502, detail=f"{upstream.name} unavailable: {exc}") from exc
+
+    released = False
+
+    async def release() -> None:
+        nonlocal released
+        if released:
+            return
+        released = True
+        await response.aclose()
+        upstream.slots.release()
+
+    async def body():
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await release()
+
+    forwarded = {name: response.headers[name] for name in FORWARDED_HEADERS if name in response.headers}
+    return StreamingResponse(
+        body(),
+        status_code=response.status_code,
+        headers=forwarded,
+        background=BackgroundTask(release),
+    )
 
 
 @app.get("/trends/instagram")
-def ig_trends():
-    with httpx.Client(timeout=30) as client:
-        data = client.post(
-            "http://insights-engine:8000/weekly",
-            json={"platform": "instagram", "k_clusters": 5},
-        ).json()
-    return data
+async def ig_trends(request: Request):
+    return await proxy(
+        request,
+        trends,
+        f"{settings.insights_engine_url}/weekly",
+        {"platform": "instagram", "k_clusters": 5},
+    )
 
 
 @app.post("/posts/generate")
-def gen_post(topic: str):
-    with httpx.Client(timeout=60) as client:
-        data = client.post(
-            "http://content-generator:8000/captions",
-            json={"platform": "instagram", "topic": topic, "n_variants": 3},
-        ).json()
-    return data
+async def gen_post(request: Request, topic: str):
+    return await proxy(
+        request,
+        generator,
+        f"{settings.content_generator_url}/captions",
+        {"platform": "instagram", "topic": topic, "n_variants": 3},
+    )
 
 
 @app.post("/posts/publish")
-def publish(caption: str, image_url: str):
-    with httpx.Client(timeout=60) as client:
-        data = client.post(
-            "http://publisher:8000/publish",
-            json={"platform": "instagram", "caption": caption, "image_url": image_url},
-        ).json()
-    return data
+async def publish(
+    request: Request,
+    caption: str,
+    image_url: str,
+    callback_url: str | None = None,
+    idempotency_key: str | None = Header(default=None),
+):
+    """Submit a publish job; returns 202 with a job ID to poll."""
+    return await proxy(
+        request,
+        publisher,
+        f"{settings.publisher_url}/jobs",
+        {
+            "platforms": ["instagram"],
+            "caption": caption,
+            "image_url": image_url,
+            "callback_url": callback_url,
+        },
+        headers={"Idempotency-Key": idempotency_key} if idempotency_key else None,
+    )
+
+
+@app.get("/posts/publish/{job_id}")
+async def publish_status(request: Request, job_id: str):
+    return await proxy(request, publisher, f"{settings.publisher_url}/jobs/{job_id}", method="GET")